@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Terminal dashboard with one plot per input pipe or file
+"""
+
+from __future__ import print_function
+from __future__ import division
+
+import os
+import re
+import sys
+import stat
+import math
+import asyncio
+import optparse
+from collections import deque
+from .utils.helpers import *
+from .utils.stats import Reservoir, StreamingHistogram, exact_bin_counts
+from .utils.compute import HistogramResult
+from .utils.redraw import Redrawer
+from .histogram import draw_vertical
+from .horizontal_histogram import draw_horizontal
+from .scatterplot import _plot_scatter
+from .utils.commandhelp import dashboard
+
+# escape sequences take no room on the screen
+ANSI = re.compile(r"\x1b\[[0-9;]*m")
+
+# bytes read from a source before the other sources get a turn
+CHUNK_SIZE = 1 << 16
+
+# points a scatter pane without a window keeps and redraws
+SAMPLE_SIZE = 4096
+
+
+def visible_len(text):
+    """
+    Length of text on the screen, without colour escape sequences
+    """
+    return len(ANSI.sub("", text))
+
+
+class HistPane(object):
+    """
+    Histogram of a column of numbers
+    """
+
+    def __init__(self, name, window=None, bincount=None, height=10, pch="o", colour="default", horizontal=False):
+        self.name = name
+        self.recent = deque(maxlen=window) if window else None
+        self.data = StreamingHistogram()
+        self.bincount = bincount
+        self.height = height
+        self.pch = pch
+        self.colour = colour
+        self.horizontal = horizontal
+
+    def add(self, line):
+        """
+        Add a line of input, returning whether it held a number
+        """
+        try:
+            number = float(line)
+        except ValueError:
+            return False
+        if self.recent is not None:
+            self.recent.append(number)
+        else:
+            self.data.update((number,))
+        return True
+
+    def render(self):
+        """
+        Lines of the pane
+        """
+        data = self.data
+        recount = None
+        if self.recent is not None:
+            data = StreamingHistogram()
+            data.update(self.recent)
+            recount = lambda edges: exact_bin_counts([self.recent], edges, data.stats.max)
+        if not data.counts:
+            return [self.name, "waiting for data"]
+        result = HistogramResult.from_histogram(data, self.bincount, recount=recount)
+        if self.horizontal:
+            canvas = draw_horizontal(result, self.height, self.pch, self.colour, self.name)
+        else:
+            canvas = draw_vertical(result, self.height, self.pch, self.colour, self.name)
+        return canvas.render().rstrip("\n").split("\n")
+
+
+class ScatterPane(object):
+    """
+    Scatterplot of x,y lines. Without a window a uniform random sample of
+    the points is plotted, on axes covering all of them.
+    """
+
+    def __init__(self, name, window=None, size=10, pch="x", colour="default", delimiter=",", sample=SAMPLE_SIZE):
+        self.name = name
+        if window:
+            self.sample = None
+            self.xs, self.ys = deque(maxlen=window), deque(maxlen=window)
+        else:
+            self.sample = Reservoir(sample)
+            self.xs, self.ys = self.sample.xs, self.sample.ys
+        self.size = size
+        self.pch = pch
+        self.colour = colour
+        self.delimiter = delimiter
+
+    def add(self, line):
+        """
+        Add a line of input, returning whether it held a point
+        """
+        fields = line.split(self.delimiter)
+        try:
+            x, y = float(fields[0]), float(fields[1])
+        except (ValueError, IndexError):
+            return False
+        if self.sample is not None:
+            self.sample.update((x,), (y,))
+        else:
+            self.xs.append(x)
+            self.ys.append(y)
+        return True
+
+    def render(self):
+        """
+        Lines of the pane
+        """
+        if not self.xs:
+            return [self.name, "waiting for data"]
+        bounds = None
+        if self.sample is not None:
+            bounds = self.sample.x_bounds, self.sample.y_bounds
+        graph = _plot_scatter(list(self.xs), list(self.ys), self.size, self.pch, self.name, "x", "y",
+                              "center", False, "python", bounds=bounds)
+        colour = get_colour(self.colour) if self.colour != "default" else ""
+        return [colour + line + bcolours["ENDC"] if colour else line for line in graph.split("\n")]
+
+
+PANES = {
+    "hist": HistPane,
+    "hbar": lambda name, **kwargs: HistPane(name, horizontal=True, **kwargs),
+    "scatter": ScatterPane,
+}
+
+
+def layout(blocks, columns, gap=2):
+    """
+    Arrange blocks of lines in a grid with the given number of columns,
+    padding every block to the widest line in its column
+    """
+    lines = []
+    for start in range(0, len(blocks), columns):
+        row = blocks[start:start + columns]
+        widths = [max(visible_len(line) for line in block) for block in row]
+        height = max(len(block) for block in row)
+        for i in range(height):
+            parts = []
+            for block, width in zip(row, widths):
+                line = block[i] if i < len(block) else ""
+                parts.append(line + " " * (width - visible_len(line)))
+            lines.append((" " * gap).join(parts).rstrip())
+        lines.append("")
+    return lines[:-1]
+
+
+async def read_lines(path, follow=False, poll=0.25):
+    """
+    Yield the lines of a pipe, named pipe or file without blocking the
+    event loop. "-" reads stdin. Regular files are read to the end, and
+    with follow are then polled for new lines like `tail -f`.
+    """
+    loop = asyncio.get_event_loop()
+    if path == "-":
+        fh = os.fdopen(os.dup(sys.stdin.fileno()), "rb", 0)
+    else:
+        # opening a named pipe waits for a writer
+        fh = await loop.run_in_executor(None, open, path, "rb", 0)
+    try:
+        mode = os.fstat(fh.fileno()).st_mode
+        if stat.S_ISFIFO(mode) or stat.S_ISCHR(mode) or stat.S_ISSOCK(mode):
+            reader = asyncio.StreamReader(limit=CHUNK_SIZE * 16)
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), fh)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                yield line.decode("utf-8", "replace")
+        else:
+            rest = b""
+            while True:
+                chunk = fh.read(CHUNK_SIZE)
+                if not chunk:
+                    if not follow:
+                        break
+                    await asyncio.sleep(poll)
+                    continue
+                lines = (rest + chunk).split(b"\n")
+                rest = lines.pop()
+                for line in lines:
+                    yield line.decode("utf-8", "replace")
+                # let the other sources have a turn
+                await asyncio.sleep(0)
+            if rest:
+                yield rest.decode("utf-8", "replace")
+    finally:
+        fh.close()
+
+
+async def _feed(path, pane, state, follow):
+    async for line in read_lines(path, follow):
+        if pane.add(line.strip()):
+            state["dirty"] = True
+
+
+async def run_dashboard(sources, fps=4.0, columns=None, follow=False, out=None):
+    """
+    Read every source concurrently into its pane and redraw the grid of
+    panes at most fps times per second, until all sources have ended
+
+    Arguments:
+        sources -- list of (path, pane) pairs, "-" is stdin
+        fps -- redraws per second
+        columns -- number of panes per row, defaults to a square grid
+        follow -- boolean value for whether or not to keep polling regular
+                  files for new lines
+        out -- file object to draw to, defaults to stdout
+    """
+    if columns is None:
+        columns = int(math.ceil(math.sqrt(len(sources))))
+    state = {"dirty": False}
+    feeds = [asyncio.ensure_future(_feed(path, pane, state, follow)) for path, pane in sources]
+    panes = [pane for _, pane in sources]
+    screen = Redrawer(out)
+    try:
+        while True:
+            await asyncio.sleep(1.0 / fps)
+            finished = all(feed.done() for feed in feeds)
+            if state["dirty"] or not screen.lines:
+                state["dirty"] = False
+                frame = "\n".join(layout([pane.render() for pane in panes], columns)) + "\n"
+                # only the cells that changed since the previous frame are sent
+                screen.draw(frame)
+            if finished:
+                break
+    finally:
+        for feed in feeds:
+            feed.cancel()
+    for feed in feeds:
+        if not feed.cancelled() and feed.exception() is not None:
+            raise feed.exception()
+
+
+def parse_source(spec):
+    """
+    Split "kind:path" into the kind of pane and the path, the kind
+    defaults to hist
+    """
+    kind, sep, path = spec.partition(":")
+    if sep and kind in PANES:
+        return kind, path
+    return "hist", spec
+
+
+def main():
+    parser = optparse.OptionParser(usage=dashboard['usage'])
+    parser.add_option('--fps', help='redraws per second (default 4)', type='float', default=4.0, dest='fps')
+    parser.add_option('--columns', help='number of panes per row', type='int', default=None, dest='columns')
+    parser.add_option('--window', help='only plot the last N values of every source', type='int',
+                      default=None, dest='window')
+    parser.add_option('-b', '--bins', help='number of bins in the histograms', type='int', default=None, dest='b')
+    parser.add_option('-s', '--size', help='height of the histograms and size of the scatterplots (default 10)',
+                      type='int', default=10, dest='size')
+    parser.add_option('-c', '--colour', help='colour of the plots (%s)' % colour_help, default='default',
+                      dest='colour')
+    parser.add_option('--follow', help='keep polling regular files for new lines', default=False,
+                      action='store_true', dest='follow')
+
+    opts, args = parser.parse_args()
+    if not args:
+        parser.error("expected at least one source")
+
+    sources = []
+    for spec in args:
+        kind, path = parse_source(spec)
+        name = "stdin" if path == "-" else os.path.basename(path)
+        if kind == "scatter":
+            pane = ScatterPane(name, opts.window, opts.size, colour=opts.colour)
+        else:
+            pane = PANES[kind](name, window=opts.window, bincount=opts.b, height=opts.size, colour=opts.colour)
+        sources.append((path, pane))
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run_dashboard(sources, opts.fps, opts.columns, opts.follow))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
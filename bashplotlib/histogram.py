@@ -10,47 +10,23 @@ from __future__ import division
 
 import os
 import sys
-import math
 import optparse
+import threading
+from collections import deque
 from os.path import dirname
 from .utils.helpers import *
-from .utils.commandhelp import hist
-
-
-def calc_bins(n, min_val, max_val, h=None, binwidth=None):
-    """
-    Calculate number of bins for the histogram
-    """
-
-    # This process is just calculating how many variables fall
-    # on certain intervals
-    if not h:
-        h = max(10, math.log(n + 1, 2))
-    # Calculating the size of the intervals
-    if binwidth == 0:
-        binwidth = 0.1
-    if binwidth is None:
-        binwidth = (max_val - min_val) / h
-    # Calculating the intervals with previously calculate interval size
-    # In our data's range (min, max)
-    for b in drange(min_val, max_val, step=binwidth, include_stop=True):
-        if b.is_integer():
-            yield int(b)
-        else:
-            yield b
-
-
-def read_numbers(numbers):
-    """
-    Read the input data in the most optimal way
-    """
-    if isiterable(numbers):
-        for number in numbers:
-            yield float(str(number).strip())
-    else:
-        with open(numbers) as fh:
-            for number in fh:
-                yield float(number.strip())
+from .utils.canvas import Canvas
+from .utils.redraw import Redrawer
+from .utils.stats import HistogramState, RunningStats, StreamingHistogram, exact_bin_counts
+from .utils.compute import HistogramResult, calc_bins, compute_hist, load_values, read_numbers
+from .utils.readers import BINARY_FORMATS, binary_help, read_binary_batches, read_weighted_batches
+from .horizontal_histogram import draw_horizontal, plot_hist as plot_hbar
+from .utils.cache import cached_batches, default_cache_dir
+from .utils.parallel import parallel_bin_counts, parallel_read
+from .utils.sketch import QuantileSketch, parse_percentiles
+from .utils.profiling import Profile
+from .utils.backends import np, array_bin_counts, array_sketch, array_summary, backend_help, resolve_backend
+from .utils.commandhelp import hbar, hist
 
 
 def run_demo():
@@ -95,7 +71,9 @@ def run_demo():
 
 
 def plot_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="default", title="", xlab=None,\
-            showSummary=False, regular=False, x_title="x_axis", y_title="y_axis"):
+            showSummary=False, regular=False, x_title="x_axis", y_title="y_axis", backend="auto",
+            percentiles=None, workers=None, cache_dir=None, on_profile=None, weights=None,
+            binary=None):
     """
     Make a histogram
 
@@ -109,67 +87,135 @@ def plot_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="def
         xlab -- boolen value for whether or not to display x-axis labels
         showSummary -- boolean value for whether or not to display a summary
         regular -- boolean value for whether or not to start y-labels at 0
+        backend -- "python", "numpy" or "auto" (numpy when installed)
+        percentiles -- list of percentiles (e.g. [50, 99, 99.9]) to estimate;
+                       they are added to the summary and returned as a dict.
+                       The estimates are within 1% of the exact values.
+        workers -- number of processes to parse a file name with, each one
+                   reading a part of the file (uses the python backend)
+        cache_dir -- directory to cache the parsed values of a file name in;
+                     later plots of the unchanged file skip the parsing
+        on_profile -- function called with a `profiling.Profile` of the time
+                      spent reading, parsing, binning and drawing
+        weights -- the number of times each value in f occurred, or True
+                   when f has "value,count" lines of pre-aggregated counts
+        binary -- "f4" or "f8" to read f as little-endian float32 or float64
+                  values instead of text
     """
     # We set our graph character
     if pch is None:
         pch = "o"
 
-    # If the user's file input is the name, we open the file and read it to f
-    if isinstance(f, str):
-        with open(f) as fh:
-            f = fh.readlines()
-
-
-    # n is the number of numbers in our data. We find the max and min
-    # values, and calculate the mean avg of our data here.
-
-    # Read number is our method that helps us to get numbers from our file
-    # And makes them iterables if they are not already
-
-    min_val, max_val = None, None
-    n, mean, sd = 0.0, 0.0, 0.0
-    for number in read_numbers(f):
-        n += 1
-        if min_val is None or number < min_val:
-            min_val = number
-        if max_val is None or number > max_val:
-            max_val = number
-        mean += number
-
-    mean /= n
-
-    # We are calculating the standard deviation, which is basically just
-    # how far away from the mean avg the number is. This is the
-    # implementation of the whole formula. We just calculate it to
-    # print in the summary part
-    for number in read_numbers(f):
-        sd += (mean - number)**2
-
-    sd /= (n - 1)
-    sd **= 0.5
-
-    # Calculating the bins for our graph. What are bins? Intervals of
-    # our data range. We will count how many elements fall on each interval
-    # and use those counts to print our graph. (sütunlar için)
-    bins = list(calc_bins(n, min_val, max_val, bincount, binwidth))
-
-    # We store our interval values in a dictionary. Keys our interval values.
-    # Items will be the number of elements in an interval
-    hist = dict((i, 0) for i in range(len(bins)))
-
-    # Calculating the number of elements on each interval and storing
-    # the data on our dictionary object
-    for number in read_numbers(f):
-        for i, b in enumerate(bins):
-            if number <= b:
-                hist[i] += 1
-                break
-        if number == max_val and max_val > bins[len(bins) - 1]:
-            hist[len(hist) - 1] += 1
-
-    # Getting the min and max of our dictionary items. This value is
+    profile = Profile()
+    # an already computed histogram, e.g. merged from several files or hosts
+    if isinstance(f, HistogramState):
+        with profile.phase("bin"):
+            result = HistogramResult.from_state(f, percentiles)
+        profile.values += f.stats.n
+    else:
+        result = compute_hist(f, bincount, binwidth, backend, percentiles, workers, cache_dir, profile, weights,
+                              binary)
+
+    with profile.phase("render"):
+        canvas = draw_vertical(result, height, pch, colour, title, xlab, showSummary, regular, x_title, y_title)
+    with profile.phase("write"):
+        canvas.write()
+    if on_profile is not None:
+        on_profile(profile)
+    return result.quantiles
+
+
+def read_histogram(paths, bincount=None, binwidth=None, with_sketch=False, workers=None, weighted=False,
+                   binary=None, backend="auto", cache_dir=None):
+    """
+    Read one or more files into a single HistogramState. When the files
+    hold too many distinct values to count them one by one, they are read a
+    second time to count them into the bins exactly
+
+    Arguments:
+        paths -- names of files with a column of numbers
+        bincount -- number of bins in the histogram
+        binwidth -- width of bins in the histogram
+        with_sketch -- boolean value for whether or not to keep a quantile
+                       sketch, needed to plot percentiles
+        workers -- number of processes to parse each file with
+        weighted -- boolean value for whether or not the files have
+                    "value,count" lines
+        binary -- "f4" or "f8" for files of little-endian binary values
+        backend -- "python", "numpy" or "auto" (numpy when installed);
+                   weighted files and several workers use the python backend
+        cache_dir -- directory to cache the parsed values of the files in;
+                     later reads of unchanged files skip the parsing
+    """
+    # as in compute_hist, cached and binary files are never split between
+    # workers
+    cached = bool(cache_dir) and not weighted and not binary
+    parallel = bool(workers and workers > 1) and not cached and not weighted and not binary
+    if not parallel and not weighted and resolve_backend(backend) == "numpy":
+        # numpy loads all the files and counts their values together
+        values = np.concatenate([load_values(path, binary, cache_dir if cached else None) for path in paths])
+        n, min_val, max_val, mean, sd = array_summary(values)
+        stats = RunningStats()
+        stats.n, stats.min, stats.max, stats.mean = n, min_val, max_val, mean
+        stats.m2 = sd * sd * (n - 1) if n > 1 else 0.0
+        sketch = None
+        if with_sketch:
+            sketch = QuantileSketch()
+            array_sketch(values, sketch)
+        bins = list(calc_bins(n, min_val, max_val, bincount, binwidth))
+        return HistogramState(bins, array_bin_counts(values, bins, max_val), stats, sketch)
+
+    def batches(path):
+        if weighted:
+            return read_weighted_batches(path)
+        if binary:
+            return read_binary_batches(path, binary)
+        return cached_batches(path, cache_dir)
+
+    data = StreamingHistogram()
+    sketch = QuantileSketch() if with_sketch else None
+    for path in paths:
+        if not (weighted or binary or cached):
+            part, part_sketch = parallel_read(path, workers or 1, with_sketch)
+            data.merge(part)
+            if sketch is not None:
+                sketch.merge(part_sketch)
+            continue
+        for batch in batches(path):
+            values, counts = batch if weighted else (batch, None)
+            data.update(values, counts)
+            if sketch is not None:
+                sketch.update(values, counts)
+    stats = data.stats
+    bins = list(calc_bins(stats.n, stats.min, stats.max, bincount, binwidth))
+    if data.exact:
+        return HistogramState.from_histogram(data, bins, sketch)
+
+    counts = [0] * len(bins)
+    for path in paths:
+        if weighted or binary or cached:
+            part = exact_bin_counts(batches(path), bins, stats.max, weighted)
+        else:
+            part = parallel_bin_counts(path, workers or 1, bins, stats.max)
+        for i, count in enumerate(part):
+            counts[i] += count
+    return HistogramState(bins, counts, stats, sketch)
+
+
+def draw_vertical(result, height=20.0, pch="o", colour="default", title="", xlab=None, showSummary=False,
+                  regular=False, x_title="x_axis", y_title="y_axis"):
+    """
+    Draw a HistogramResult as vertical bars into a Canvas
+
+    The arguments are the same as for plot_hist.
+    """
+    hist = result.counts
+    if pch is None:
+        pch = "o"
+
+    # Getting the min and max of the bin counts. This value is
     # The left side of the histogram: how many items are in a bin?
-    min_y, max_y = min(hist.values()), max(hist.values())
+    min_y, max_y = min(hist), max(hist)
 
     # Calculating the start and stop values for drange function
     # Which will calculate the interval values again, this time not
@@ -193,12 +239,15 @@ def plot_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="def
     # nlen is the size of the left side of the histogram that we will print
     nlen = max(len(str(min_y)), len(str(max_y))) + 1
 
+    # The plot is drawn into a canvas and written out in one go
+    canvas = Canvas()
+
     # We print the title with our box_text function
     if title:
-        print(box_text([title], max(len(hist) * 2, len(title)), 1, "center", nlen))
+        canvas.draw(box_text([title], max(len(hist) * 2, len(title)), 1, "center", nlen) + "\n")
 
     # Printing the y axis title
-    print(y_title)
+    canvas.draw(y_title + "\n")
 
     # To print a interval value label only once, we print it only once
     used_labs = set()
@@ -214,38 +263,34 @@ def plot_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="def
             ylab = " " * (nlen - len(ylab)) + ylab + "|"
 
         # Print the interval value
-        print(ylab, end=' ')
+        canvas.draw(ylab + " ")
 
         # Our loop looks at every interval value in our dictionary
-        for i in range(len(hist)):
-            # if the number of items in that interval is greater
-            # than the y values interval, that means in that interval
-            # there is values. so we print it. If not, we print an empty
-            # character.
-            if int(y) <= hist[i]:
-                printcolour(pch, True, colour)
-            else:
-                printcolour(" ", True, colour)
-        print('')
+        # if the number of items in that interval is greater
+        # than the y values interval, that means in that interval
+        # there is values. so we print it. If not, we print an empty
+        # character. The whole row is drawn as a single coloured run.
+        row = "".join(pch if int(y) <= hist[i] else " " for i in range(len(hist)))
+        canvas.draw(row, colour)
+        canvas.newline()
 
 
-    xs = hist.keys()
     # Print the "-" character at the bottom of the histogram
-    # The number of characters is the number of keys in our hist dictionary
-    print(" " * (nlen + 1) + "-" * len(xs))
+    # The number of characters is the number of bins
+    canvas.draw(" " * (nlen + 1) + "-" * len(hist) + "\n")
 
     # If user wanted x labels to be printed
     if xlab:
         # Abbreviate takes a list of strings, and returns a shortened,
         # equal length strings to print
-        labels = abbreviate([str(b) for b in bins])
+        labels = abbreviate([str(b) for b in result.edges])
         xlen = len(labels[0])
         # We print xlen number of lines
         for i in range(0, xlen):
             # Offset
-            printcolour(" " * (nlen + 1), True, colour)
-            # What we print is the shortened interval values in hist
-            # dictionary. We print the value of each
+            canvas.draw(" " * (nlen + 1), colour)
+            # What we print is the shortened interval values of the
+            # bins. We print the value of each
             for x in range(0, len(hist)):
                 num = labels[x]
                 # Only printing at even points to separate them
@@ -253,31 +298,104 @@ def plot_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="def
                     pass
                 elif i < len(num):
                     # Printing only one character of the value in each line
-                    print(num[i], end=' ')
+                    canvas.draw(num[i] + " ")
                 else:
-                    print(" ", end=' ')
+                    canvas.draw("  ")
             # for next line
-            print('')
+            canvas.newline()
 
-    print(x_title.rjust(len(hist)*2))
-    center = max(map(len, map(str, [n, min_val, mean, max_val])))
-    center += 15
+    canvas.draw(x_title.rjust(len(hist)*2) + "\n")
 
     # Printing the summary with box text helper function
     if showSummary:
-        summary_lines = [
-            "Summary",
-            "observations: %d" % n,
-            "min value: %f" % min_val,
-            "mean : %f" % mean,
-            "std dev : %f" % sd,
-            ("max value: %f" % max_val)
-        ]
-        print(box_text(summary_lines, max(len(hist) * 2, len(title)), 2, "center", nlen))
+        canvas.draw(box_text(result.summary_lines(), max(len(hist) * 2, len(title)), 2, "center", nlen) + "\n")
+    return canvas
 
-def main():
+def follow_hist(stream, interval=1.0, window=None, decay=None, height=20.0, bincount=None, binwidth=None,
+                pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False,
+                x_title="x_axis", y_title="y_axis", out=None, horizontal=False):
+    """
+    Plot a histogram of a stream that is still being written to, redrawing it
+    in place every interval seconds until the stream ends
 
-    parser = optparse.OptionParser(usage=hist['usage'])
+    Arguments:
+        stream -- file object with a number on each line, unparsable lines are skipped
+        interval -- seconds between redraws
+        window -- only plot the most recent `window` values
+        decay -- factor the counts are multiplied by at every redraw, so that
+                 old values fade out
+        out -- file object to draw to, defaults to stdout
+        horizontal -- boolean value for whether or not to draw horizontal bars
+    The remaining arguments are the same as for plot_hist.
+
+    Without a window the stream is never read again, so once it holds more
+    than 16384 distinct values the counts are pooled and approximate (see
+    `StreamingHistogram`).
+    """
+    lock = threading.Lock()
+    done = threading.Event()
+    recent = deque(maxlen=window) if window else None
+    data = StreamingHistogram()
+    errors = []
+
+    def consume():
+        # a failing read ends the redraws too, and is raised below
+        try:
+            for line in stream:
+                try:
+                    number = float(line.strip())
+                except ValueError:
+                    continue
+                with lock:
+                    if recent is not None:
+                        recent.append(number)
+                    else:
+                        data.update((number,))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    reader = threading.Thread(target=consume)
+    reader.daemon = True
+    reader.start()
+
+    screen = Redrawer(out)
+    while True:
+        finished = done.wait(interval)
+        frame = None
+        with lock:
+            recount = None
+            if recent is not None:
+                current = StreamingHistogram()
+                current.update(recent)
+                recount = lambda edges: exact_bin_counts([recent], edges, current.stats.max)
+            else:
+                current = data
+            if current.counts:
+                result = HistogramResult.from_histogram(current, bincount, binwidth, recount=recount)
+                if horizontal:
+                    canvas = draw_horizontal(result, height, pch, colour, title, xlab, showSummary, regular)
+                else:
+                    canvas = draw_vertical(result, height, pch, colour, title, xlab, showSummary, regular,
+                                           x_title, y_title)
+                frame = canvas.render()
+            if decay and recent is None:
+                data.decay(decay)
+        if frame is not None:
+            # only the cells that changed since the previous frame are sent
+            screen.draw(frame)
+        if finished:
+            break
+    if errors:
+        raise errors[0]
+
+
+def build_parser(usage=hist['usage']):
+    """
+    Command line options shared by hist and hbar
+    """
+    parser = optparse.OptionParser(usage=usage)
 
     parser.add_option(
         '-f', '--file', help='a file containing a column of numbers', default=None, dest='f')
@@ -286,7 +404,7 @@ def main():
         '-b', '--bins', help='number of bins in the histogram', type='int', default=None, dest='b')
     parser.add_option('-w', '--binwidth', help='width of bins in the histogram',
                       type='float', default=None, dest='binwidth')
-    parser.add_option('-s', '--height', help='height of the histogram (in lines)',
+    parser.add_option('-s', '--height', help='height of the histogram (in lines), the length of the bars with --horizontal',
                       type='int', default=None, dest='h')
     parser.add_option('-p', '--pch', help='shape of each bar', default='o', dest='p')
     parser.add_option('-x', '--xlab', help='label bins on x-axis',
@@ -299,20 +417,86 @@ def main():
     parser.add_option('-r', '--regular',
                       help='use regular y-scale (0 - maximum y value), instead of truncated y-scale (minimum y-value - maximum y-value)',
                       default=False, action="store_true", dest='regular')
-
+    parser.add_option('--backend', help='computation backend (%s)' % backend_help,
+                      default='auto', dest='backend')
+    parser.add_option('--percentiles', help='comma separated percentiles to add to the summary, e.g. 50,99,99.9',
+                      default=None, dest='percentiles')
+    parser.add_option('-j', '--jobs', help='number of processes to parse the input file with',
+                      type='int', default=None, dest='jobs')
+    parser.add_option('--cache', help='cache the parsed values of the input file to speed up replotting it',
+                      default=False, action='store_true', dest='cache')
+    parser.add_option('--cache-dir', help='directory for --cache (default %s)' % default_cache_dir(),
+                      default=None, dest='cache_dir')
+    parser.add_option('--follow', help='keep reading the input and redraw the histogram as it grows',
+                      default=False, action='store_true', dest='follow')
+    parser.add_option('--interval', help='seconds between redraws in --follow mode',
+                      type='float', default=1.0, dest='interval')
+    parser.add_option('--window', help='only plot the last N values in --follow mode',
+                      type='int', default=None, dest='window')
+    parser.add_option('--decay', help='multiply the counts by this factor at every redraw in --follow mode',
+                      type='float', default=None, dest='decay')
+    parser.add_option('--horizontal', help='draw horizontal bars, one bin per line',
+                      default=False, action='store_true', dest='horizontal')
+    parser.add_option('--weighted', help='read pre-aggregated value,count lines',
+                      default=False, action='store_true', dest='weighted')
+    parser.add_option('--binary', help='read little-endian binary values instead of text (%s)' % binary_help,
+                      default=None, dest='binary')
+    parser.add_option('--profile', help='report the time spent in each phase of the plot on stderr',
+                      action='store_const', const='human', default=None, dest='profile')
+    parser.add_option('--profile-json', help='report the time spent in each phase as JSON on stderr',
+                      action='store_const', const='json', dest='profile')
+    return parser
+
+
+def main(horizontal=False):
+
+    parser = build_parser(hbar['usage'] if horizontal else hist['usage'])
     opts, args = parser.parse_args()
-
-    if opts.f is None:
+    if opts.binary and opts.binary not in BINARY_FORMATS:
+        parser.error("--binary must be one of: %s" % binary_help)
+    if opts.binary and opts.weighted:
+        parser.error("--binary cannot be combined with --weighted")
+    horizontal = horizontal or opts.horizontal
+
+    cache_dir = opts.cache_dir or (default_cache_dir() if opts.cache else None)
+
+    files = ([opts.f] if opts.f else []) + args
+    if opts.follow and len(files) > 1:
+        parser.error("--follow takes a single input")
+    if len(files) > 1:
+        # several files are merged into a single histogram
+        opts.f = read_histogram(files, opts.b, opts.binwidth, bool(opts.percentiles), opts.jobs, opts.weighted,
+                                opts.binary, opts.backend, cache_dir)
+    elif opts.f is None:
         if len(args) > 0:
             opts.f = args[0]
         elif opts.demo is None or opts.demo is False:
-            opts.f = sys.stdin.readlines()
+            opts.f = sys.stdin
 
     if opts.demo:
         run_demo()
+    elif opts.follow and (opts.weighted or opts.binary):
+        parser.error("--weighted and --binary cannot be used with --follow")
+    elif opts.follow:
+        stream = open(opts.f) if isinstance(opts.f, str) else opts.f
+        try:
+            follow_hist(stream, opts.interval, opts.window, opts.decay, opts.h, opts.b, opts.binwidth,
+                        opts.p, opts.colour, opts.t, opts.x, opts.showSummary, opts.regular,
+                        horizontal=horizontal)
+        except KeyboardInterrupt:
+            pass
     elif opts.f:
-        plot_hist(opts.f, opts.h, opts.b, opts.binwidth, opts.p, opts.colour,
-                  opts.t, opts.x, opts.showSummary, opts.regular)
+        on_profile = None
+        if opts.profile:
+            on_profile = lambda profile: profile.write(fmt=opts.profile)
+        # the horizontal plot_hist takes the same arguments, with the bar
+        # length in place of the height and ylab in place of xlab
+        plot = plot_hbar if horizontal else plot_hist
+        plot(opts.f, opts.h, opts.b, opts.binwidth, opts.p, opts.colour,
+             opts.t, opts.x, opts.showSummary, opts.regular, backend=opts.backend,
+             percentiles=opts.percentiles and parse_percentiles(opts.percentiles), workers=opts.jobs,
+             cache_dir=cache_dir, on_profile=on_profile, weights=True if opts.weighted else None,
+             binary=opts.binary)
     else:
         print("nothing to plot!")
 
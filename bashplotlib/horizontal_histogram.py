@@ -8,42 +8,18 @@ Plotting terminal based histograms
 from __future__ import print_function
 from __future__ import division
 
-import math
+from bisect import bisect_right
 from .utils.helpers import *
-
-
-def calc_bins(n, min_val, max_val, h=None, binwidth=None):
-    """
-    Calculate number of bins for the histogram
-    """
-    if not h:
-        h = max(10, math.log(n + 1, 2))
-    if binwidth == 0:
-        binwidth = 0.1
-    if binwidth is None:
-        binwidth = (max_val - min_val) / h
-    for b in drange(min_val, max_val, step=binwidth, include_stop=True):
-        if b.is_integer():
-            yield int(b)
-        else:
-            yield b
-
-
-def read_numbers(numbers):
-    """
-    Read the input data in the most optimal way
-    """
-    if isiterable(numbers):
-        for number in numbers:
-            yield float(str(number).strip())
-    else:
-        with open(numbers) as fh:
-            for number in fh:
-                yield float(number.strip())
+from .utils.canvas import Canvas
+from .utils.stats import HistogramState
+from .utils.compute import HistogramResult, compute_hist
+from .utils.profiling import Profile
 
 
 def plot_hist(f, width=20.0, bincount=None, binwidth=None, pch="o", colour="default", title="", ylab=None,\
-            showSummary=False, regular=False, x_title="x_axis", y_title="y_axis"):
+            showSummary=False, regular=False, x_title="x_axis", y_title="y_axis", backend="auto",
+            percentiles=None, workers=None, cache_dir=None, on_profile=None, weights=None,
+            binary=None):
     """
     Make a histogram
 
@@ -57,67 +33,58 @@ def plot_hist(f, width=20.0, bincount=None, binwidth=None, pch="o", colour="defa
         xlab -- boolen value for whether or not to display x-axis labels
         showSummary -- boolean value for whether or not to display a summary
         regular -- boolean value for whether or not to start y-labels at 0
+        backend -- "python", "numpy" or "auto" (numpy when installed)
+        percentiles -- list of percentiles (e.g. [50, 99, 99.9]) to estimate;
+                       they are added to the summary and returned as a dict.
+                       The estimates are within 1% of the exact values.
+        workers -- number of processes to parse a file name with, each one
+                   reading a part of the file (uses the python backend)
+        cache_dir -- directory to cache the parsed values of a file name in;
+                     later plots of the unchanged file skip the parsing
+        on_profile -- function called with a `profiling.Profile` of the time
+                      spent reading, parsing, binning and drawing
+        weights -- the number of times each value in f occurred, or True
+                   when f has "value,count" lines of pre-aggregated counts
+        binary -- "f4" or "f8" to read f as little-endian float32 or float64
+                  values instead of text
     """
     # We set our graph character
     if pch is None:
         pch = "o"
 
-    # If the user's file input is the name, we open the file and read it to f
-    if isinstance(f, str):
-        with open(f) as fh:
-            f = fh.readlines()
-
-    # n is the number of numbers in our data. We find the max and min
-    # values, and calculate the mean avg of our data here.
-
-    min_val, max_val = None, None
-    n, mean, sd = 0.0, 0.0, 0.0
-    for number in read_numbers(f):
-        n += 1
-        if min_val is None or number < min_val:
-            min_val = number
-        if max_val is None or number > max_val:
-            max_val = number
-        mean += number
-
-    mean /= n
-
-    # We are calculating the standard deviation, which is basically just
-    # how far away from the mean avg the number is. This is the
-    # implementation of the whole formula. We just calculate it to
-    # print in the summary part
-    for number in read_numbers(f):
-        sd += (mean - number) ** 2
-    sd /= (n - 1)
-    sd **= 0.5
-
-    # Calculating the bins for our graph. What are bins? Intervals of
-    # our data range. We will count how many elements fall on each interval
-    # and use those counts to print our graph. (sütunlar için)
-    bins = list(calc_bins(n, min_val, max_val, bincount, binwidth))
-
-    # We store our interval values in a dictionary. Keys our interval values.
-    # Items will be the number of elements in an interval
-    hist = dict((i, 0) for i in range(len(bins)))
-
-    # Calculating the number of elements on each interval and storing
-    # the data on our dictionary object
-    for number in read_numbers(f):
-        for i, b in enumerate(bins):
-            if number <= b:
-                hist[i] += 1
-                break
-        if number == max_val and max_val > bins[len(bins) - 1]:
-            hist[len(hist) - 1] += 1
-
-    # Getting the min and max of our dictionary items. This value is
-    # The left side of the histogram: how many items are in a bin?
-    min_y, max_y = min(hist.values()), max(hist.values())
+    profile = Profile()
+    # an already computed histogram, e.g. merged from several files or hosts
+    if isinstance(f, HistogramState):
+        with profile.phase("bin"):
+            result = HistogramResult.from_state(f, percentiles)
+        profile.values += f.stats.n
+    else:
+        result = compute_hist(f, bincount, binwidth, backend, percentiles, workers, cache_dir, profile, weights,
+                              binary)
+
+    with profile.phase("render"):
+        canvas = draw_horizontal(result, width, pch, colour, title, ylab, showSummary, regular)
+    with profile.phase("write"):
+        canvas.write()
+    if on_profile is not None:
+        on_profile(profile)
+    return result.quantiles
+
 
+def draw_horizontal(result, width=20.0, pch="o", colour="default", title="", ylab=None, showSummary=False,
+                    regular=False):
+    """
+    Draw a HistogramResult as horizontal bars into a Canvas
 
-    # Getting the min and max of our dictionary items. This value is
+    The arguments are the same as for plot_hist.
+    """
+    hist = result.counts
+    if pch is None:
+        pch = "o"
+
+    # Getting the min and max of the bin counts. This value is
     # The left side of the histogram: how many items are in a bin?
-    min_y, max_y = min(hist.values()), max(hist.values())
+    min_y, max_y = min(hist), max(hist)
 
     # Calculating the start and stop values for drange function
     # Which will calculate the interval values again, this time not
@@ -141,55 +108,64 @@ def plot_hist(f, width=20.0, bincount=None, binwidth=None, pch="o", colour="defa
     # side of the histogram that we will print at bottom
     nlen = max(len(str(min_y)), len(str(max_y))) + 1
 
+    # The plot is drawn into a canvas and written out in one go
+    canvas = Canvas()
+
+    labels = abbreviate([str(b) for b in result.edges])
+    x_labels_len = len(labels[0])
+
+    # The boxes follow the number of bins, but no wider than the plot so
+    # that thousands of bins still get a readable summary
+    box_width = max(min(len(hist), len(ys) + x_labels_len) * 2, len(title))
+
     # We print the title with our box_text function
     if title:
-        print(box_text([title], max(len(hist) * 2, len(title)), 1, "center", nlen))
+        canvas.draw(box_text([title], box_width, 1, "center", nlen) + "\n")
 
+    # One bin per line, the highest bin on top. The bar of a bin covers
+    # the count labels up to its count, and the labels never decrease, so
+    # its length is found with a bisection and drawn as a single string
+    ticks = [int(y) for y in ys]
     used_labs = set()
-
-    labels = abbreviate([str(b) for b in bins])
-    labels.reverse()
-    x_labels_len = len(labels[0])
-    for i in range(0, len(labels)):
+    for i in reversed(range(len(labels))):
         if labels[i] in used_labs:
             lab = ""
         else:
             used_labs.add(labels[i])
             lab = " " * (nlen - len(labels[i])) + labels[i] + "|"
-        print(lab, end=" ")
+        canvas.draw(lab + " ")
 
-        for k in range(0, len(ys)):
-            if hist[i] >= int(ys[k]):
-                printcolour(pch, True, colour)
-            else:
-                printcolour(" ", True, colour)
-        print('')
+        length = bisect_right(ticks, hist[i])
+        canvas.draw(pch * length + " " * (len(ticks) - length), colour)
+        canvas.newline()
 
-    print(" " * (x_labels_len+ 1) + "+" + "-" * len(ys))
+    canvas.draw(" " * (x_labels_len+ 1) + "+" + "-" * len(ys) + "\n")
     if ylab:
         for i in range(0, nlen):
-            printcolour(" " * (x_labels_len + 3), True, colour)
+            canvas.draw(" " * (x_labels_len + 3), colour)
             for x in range(0, len(ys)):
                 num = str(int(ys[x]))
                 if x % 2 == 0:
                     pass
                 elif i < len(num):
                     # Printing only one character of the value in each line
-                    print(num[i], end=' ')
+                    canvas.draw(num[i] + " ")
                 else:
-                    print(" ", end=' ')
-            print('')
+                    canvas.draw("  ")
+            canvas.newline()
 
     # Printing the summary with box text helper function
     if showSummary:
-        summary_lines = [
-            "Summary",
-            "observations: %d" % n,
-            "min value: %f" % min_val,
-            "mean : %f" % mean,
-            "std dev : %f" % sd,
-            ("max value: %f" % max_val)
-        ]
-        print(box_text(summary_lines, max(len(hist) * 2, len(title)), 2, "center", nlen))
+        canvas.draw(box_text(result.summary_lines(), box_width, 2, "center", nlen) + "\n")
+    return canvas
+
+
+def main():
+    # the options are shared with hist, see histogram.main
+    from .histogram import main as hist_main
+
+    hist_main(horizontal=True)
 
 
+if __name__ == "__main__":
+    main()
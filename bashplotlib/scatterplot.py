@@ -6,12 +6,26 @@ Plotting terminal based scatterplots
 """
 
 from __future__ import print_function
-import csv
+import os
 import sys
+import math
 import optparse
+from array import array
+from bisect import bisect_left, bisect_right
 from .utils.helpers import *
+from .utils.backends import (np, backend_help, braille_cells, cell_counts, load_array, load_binary,
+                             point_cells, resolve_backend)
+from .utils.braille import BrailleCanvas
+from .utils.readers import (BATCH_SIZE, BINARY_FORMATS, binary_help, iter_columns, read_binary_batches,
+                            read_columns)
+from .utils.stats import Reservoir
+from .utils.profiling import Profile
 from .utils.commandhelp import scatter
 
+# characters and colours used for increasing point density
+DENSITY_RAMP = " .:-=+*#%@"
+DENSITY_COLOURS = ["blue", "aqua", "green", "yellow", "red"]
+
 
 def get_scale(series, is_y=False, steps=20):
     min_val = min(series)
@@ -28,46 +42,262 @@ def get_scale(series, is_y=False, steps=20):
     return scaled_series
 
 
-def _plot_scatter(xs, ys, size, pch, title, x_title, y_title, txt_align, show_axes):
+def _axis_char(x, y, show_axes, crosses_x_axis, crosses_y_axis):
+    """
+    Return the axis character drawn at grid position (x, y), if any
+    """
+    if not show_axes:
+        return None
+    if y == x == 0 and crosses_x_axis and crosses_y_axis:
+        return "0"
+    if y == 0 and crosses_y_axis:
+        return "-"
+    if x == 0 and crosses_x_axis:
+        return "|"
+    return None
+
+
+def _axis_cell(xs, ys, targets, cell, axis, pch):
+    """
+    Resolve a cell on one of the axes. A point is plotted in the first cell
+    (top to bottom, left to right) that is right of and below it, and the
+    axis character is drawn as soon as any other point is considered for
+    the cell, so the order of the points decides which character wins.
+    """
+    n = len(xs)
     plotted = set()
-    scale = len(get_scale(xs, False, size))
+    point = " "
+    tried_axis = False
+    expected = 0
+    for t in targets:
+        if not tried_axis and t > expected:
+            # a point plotted elsewhere comes first
+            tried_axis = True
+            if cell not in plotted:
+                point = axis
+                plotted.add(cell)
+        expected = t + 1
+        key = (xs[t], ys[t])
+        if key in plotted:
+            if not tried_axis:
+                tried_axis = True
+                if cell not in plotted:
+                    point = axis
+                    plotted.add(cell)
+        else:
+            point = pch
+            plotted.add(key)
+    if not tried_axis and expected < n:
+        if cell not in plotted:
+            point = axis
+    return point
+
+
+def _point_cells(xs, ys, x_scale, y_scale, axis_row=None, axis_col=None):
+    """
+    Map every point to the cell it is plotted in: the first column whose x
+    is not less than the point's and the first row (top down) whose y is not
+    greater than the point's. Returns the set of occupied (row, col) cells
+    and the indices of the points placed on each cell of the axes.
+    """
+    nrows, ncols = len(y_scale), len(x_scale)
+    y_ascending = y_scale[::-1]
+    occupied = set()
+    axis_targets = {}
+    for i, (xp, yp) in enumerate(zip(xs, ys)):
+        col = bisect_left(x_scale, xp)
+        row = nrows - bisect_right(y_ascending, yp)
+        if col == ncols or row == nrows:
+            continue
+        occupied.add((row, col))
+        if row == axis_row or col == axis_col:
+            axis_targets.setdefault((row, col), []).append(i)
+    return occupied, axis_targets
+
+
+def _cell_counts(xs, ys, x_scale, y_scale):
+    """
+    Count the points plotted in each (row, col) cell, using the same
+    placement as `_point_cells`
+    """
+    nrows, ncols = len(y_scale), len(x_scale)
+    y_ascending = y_scale[::-1]
+    counts = {}
+    for xp, yp in zip(xs, ys):
+        col = bisect_left(x_scale, xp)
+        row = nrows - bisect_right(y_ascending, yp)
+        if col < ncols and row < nrows:
+            counts[(row, col)] = counts.get((row, col), 0) + 1
+    return counts
+
+
+def _cell_colours(xs, ys, colours, x_scale, y_scale):
+    """
+    Colour of the first point plotted in each (row, col) cell, using the
+    same placement as `_point_cells`
+    """
+    nrows, ncols = len(y_scale), len(x_scale)
+    y_ascending = y_scale[::-1]
+    cell_colours = {}
+    for xp, yp, colour in zip(xs, ys, colours):
+        col = bisect_left(x_scale, xp)
+        row = nrows - bisect_right(y_ascending, yp)
+        if col < ncols and row < nrows and (row, col) not in cell_colours:
+            cell_colours[(row, col)] = colour
+    return cell_colours
+
+
+def _density_rows(counts, x_scale, y_scale, pch, density, show_axes, crosses_x_axis, crosses_y_axis):
+    """
+    Build the rows of a density plot. Counts are shaded on a logarithmic
+    scale, with the character ramp or, for density="colour", by colouring pch
+    """
+    max_count = max(counts.values()) if counts else 1
+    ramp = DENSITY_RAMP if density != "colour" else DENSITY_COLOURS
+    levels = len(ramp) - 1 if density != "colour" else len(ramp)
+    rows = []
+    for r, y in enumerate(y_scale):
+        row = []
+        for c, x in enumerate(x_scale):
+            count = counts.get((r, c), 0)
+            if not count:
+                point = _axis_char(x, y, show_axes, crosses_x_axis, crosses_y_axis) or " "
+            else:
+                level = int(math.ceil(math.log1p(count) / math.log1p(max_count) * levels))
+                if density == "colour":
+                    point = get_colour(ramp[level - 1]) + pch + bcolours["ENDC"]
+                else:
+                    point = ramp[level]
+            row.append(point)
+        rows.append("| " + " ".join(row) + "  |\n")
+    return "".join(rows)
+
+
+def _grid_rows(xs, ys, x_scale, y_scale, pch, show_axes, crosses_x_axis, crosses_y_axis, cells,
+               cell_colours=None):
+    """
+    Build the rows of the plot from the occupied cells, colouring the
+    points of cells found in cell_colours
+    """
+    occupied, axis_targets = cells
+    rows = []
+    for r, y in enumerate(y_scale):
+        row = []
+        for c, x in enumerate(x_scale):
+            axis = _axis_char(x, y, show_axes, crosses_x_axis, crosses_y_axis)
+            if axis is not None:
+                point = _axis_cell(xs, ys, axis_targets.get((r, c), []), (x, y), axis, pch)
+            elif (r, c) in occupied:
+                point = pch
+                if cell_colours and (r, c) in cell_colours:
+                    point = get_colour(cell_colours[(r, c)]) + pch + bcolours["ENDC"]
+            else:
+                point = " "
+            row.append(point)
+        rows.append("| " + " ".join(row) + "  |\n")
+    return "".join(rows)
+
+
+def _braille_graph(xs, ys, x_bounds, y_bounds, size, title, x_title, y_title, txt_align, show_axes, backend,
+                   colours, profile):
+    """
+    Draw the points as Braille dots, 2x4 per character, on a raster of
+    2 * size by size characters
+    """
+    width, height = 2 * size, size
+    canvas = BrailleCanvas(width, height)
+    with profile.phase("bin"):
+        if backend == "numpy" and colours is None:
+            canvas.cells = braille_cells(xs, ys, x_bounds, y_bounds, width, height)
+            cell_colours = {}
+        else:
+            cell_colours = canvas.plot(xs, ys, x_bounds, y_bounds, colours)
+        if show_axes:
+            canvas.axes(x_bounds, y_bounds)
+
+    with profile.phase("render"):
+        graph = ""
+        if title:
+            graph += box_text([title], width + 2, 1, txt_align)
+        graph += "y: " + y_title + "\n" + "+" + "-" * (width + 2) + "+\n"
+        for r, row in enumerate(canvas.rows()):
+            if cell_colours:
+                start = r * width
+                row = "".join(get_colour(cell_colours[start + c]) + ch + bcolours["ENDC"]
+                              if start + c in cell_colours else ch for c, ch in enumerate(row))
+            graph += "| " + row + " |\n"
+        graph += "+" + "-" * (width + 2) + "+\n" + ("x: " + x_title).rjust(width + 4)
+    return graph
+
+
+def _plot_scatter(xs, ys, size, pch, title, x_title, y_title, txt_align, show_axes, backend="auto", density=None,
+                  colours=None, profile=None, bounds=None, braille=False):
+    backend = resolve_backend(backend)
+    if profile is None:
+        profile = Profile()
+    with profile.phase("stats"):
+        if backend == "numpy":
+            xs = np.asarray(xs, dtype=float)
+            ys = np.asarray(ys, dtype=float)
+        if bounds is not None:
+            # the range of all the points when xs and ys are a sample
+            x_bounds, y_bounds = bounds
+        elif backend == "numpy":
+            x_bounds, y_bounds = (xs.min(), xs.max()), (ys.min(), ys.max())
+        else:
+            x_bounds, y_bounds = (min(xs), max(xs)), (min(ys), max(ys))
+    if braille:
+        return _braille_graph(xs, ys, x_bounds, y_bounds, size, title, x_title, y_title, txt_align, show_axes,
+                              backend, colours, profile)
+    with profile.phase("bin"):
+        x_scale = get_scale(x_bounds, False, size)
+        y_scale = get_scale(y_bounds, True, size)
+    scale = len(x_scale)
     x_title, y_title = "x: " + x_title, "y: " + y_title
-    crosses_x_axis, crosses_y_axis = max(xs) > 0 > min(xs), max(ys) > 0 > min(ys)
+    crosses_x_axis, crosses_y_axis = x_bounds[1] > 0 > x_bounds[0], y_bounds[1] > 0 > y_bounds[0]
     graph = ""
 
     if title:
-        graph += box_text([title], 2 * (scale + 1), 1, txt_align) + "\n"
+        graph += box_text([title], 2 * (scale + 1), 1, txt_align)
 
     graph += y_title + "\n" + ("+" + "-" * (2 * scale + 2) + "+\n")
-    for y in get_scale(ys, True, size):
-        graph += "| "
-        for x in get_scale(xs, False, size):
-            point = " "
-            for (i, (xp, yp)) in enumerate(zip(xs, ys)):
-                if xp <= x and yp >= y and (xp, yp) not in plotted:
-                    point = pch
-                    plotted.add((xp, yp))
-                elif show_axes and y == x == 0 and (x, y) not in plotted and crosses_x_axis and crosses_y_axis :
-                    point = "0"
-                    plotted.add((x, y))
-                elif show_axes and y == 0 and (x, y) not in plotted and crosses_y_axis:
-                    point = "-"
-                    plotted.add((x, y))
-                elif show_axes and x == 0 and (x, y) not in plotted and crosses_x_axis:
-                    point = "|"
-                    plotted.add((x, y))
-            graph += point + " "
-        graph += " |\n"
+    # each point is mapped to its cell once instead of scanning every point
+    # for every cell
+    if density:
+        with profile.phase("bin"):
+            if backend == "numpy":
+                counts = cell_counts(xs, ys, x_scale, y_scale)
+            else:
+                counts = _cell_counts(xs, ys, x_scale, y_scale)
+        with profile.phase("render"):
+            graph += _density_rows(counts, x_scale, y_scale, pch, density, show_axes, crosses_x_axis,
+                                   crosses_y_axis)
+        graph += "+" + "-" * (2 * scale + 2) + "+\n" + x_title.rjust((scale + 2) * 2)
+        return graph
+
+    axis_row = y_scale.index(0) if show_axes and 0 in y_scale else None
+    axis_col = x_scale.index(0) if show_axes and 0 in x_scale else None
+    with profile.phase("bin"):
+        if backend == "numpy":
+            cells = point_cells(xs, ys, x_scale, y_scale, axis_row, axis_col)
+        else:
+            cells = _point_cells(xs, ys, x_scale, y_scale, axis_row, axis_col)
+        cell_colours = _cell_colours(xs, ys, colours, x_scale, y_scale) if colours else None
+    with profile.phase("render"):
+        graph += _grid_rows(xs, ys, x_scale, y_scale, pch, show_axes, crosses_x_axis, crosses_y_axis, cells,
+                            cell_colours)
     graph += "+" + "-" * (2 * scale + 2) + "+\n" + x_title.rjust((scale + 2) * 2)
     return graph
 
 
-def plot_scatter(f, xs, ys, size, pch, colour, title, x_title="My x axis", y_title="My y axis", txt_align="center", show_axes=False):
+def plot_scatter(f, xs, ys, size, pch, colour, title, x_title="My x axis", y_title="My y axis", txt_align="center", show_axes=False,
+                 backend="auto", density=None, xcol=0, ycol=1, colourcol=None, delimiter=",", on_profile=None,
+                 sample=None, braille=False, binary=None):
     """
     Form a complex number.
 
     Arguments:
-        f -- comma delimited file w/ x,y coordinates
+        f -- delimited file (or file object or list of lines) w/ x,y coordinates
         xs -- if f not specified this is a file w/ x coordinates
         ys -- if f not specified this is a file w/ y coordinates
         size -- size of the plot
@@ -77,28 +307,103 @@ def plot_scatter(f, xs, ys, size, pch, colour, title, x_title="My x axis", y_tit
         x_title -- title of the x-coordinate of the plot
         y_title -- title of the y_coordinate of the plot
         txt_align -- alignment preference for the title of the plot
+        show_axes -- boolean value for whether or not to draw the 0-axes
+        backend -- "python", "numpy" or "auto" (numpy when installed)
+        density -- "chars" to shade each cell by the number of points in it
+                   with the characters in DENSITY_RAMP, "colour" to colour pch
+                   with DENSITY_COLOURS instead
+        xcol -- column of f with the x coordinates, an index (0 based) or a
+                header name
+        ycol -- column of f with the y coordinates
+        colourcol -- column of f with a colour name for each point
+        delimiter -- field separator of f
+        on_profile -- function called with a `profiling.Profile` of the time
+                      spent parsing, scaling and drawing
+        sample -- plot a uniform random sample of this many points of f,
+                  streaming the input in constant memory; the axes still
+                  cover all the points
+        braille -- boolean value for whether or not to draw the points as
+                   Braille dots, 8 per character, instead of one pch per cell
+        binary -- "f4" or "f8" to read f as interleaved x,y pairs of
+                  little-endian float32 or float64 values instead of text
     """
+    backend = resolve_backend(backend)
     cs = None
-    if f:
-        if isinstance(f, str):
-            with open(f) as fh:
-                data = [tuple(line.strip().split(',')) for line in fh]
+    profile = Profile()
+    if isinstance(f, str):
+        profile.bytes += os.path.getsize(f)
+    elif f and on_profile is not None and not binary:
+        f = profile.lines(f)
+    # the columns are read and parsed row by row, timed together as parsing
+    bounds = seen = None
+    with profile.phase("parse"):
+        if f and binary and (sample or backend != "numpy"):
+            reservoir = Reservoir(sample) if sample else None
+            code = BINARY_FORMATS[binary]
+            xs, ys = array(code), array(code)
+            for batch in read_binary_batches(f, binary, group=2):
+                # the batch is a view of the input: its bytes are copied out
+                # in one go and split into x and y by strided slices, without
+                # a Python float per value
+                values = array(code)
+                values.frombytes(memoryview(batch).cast("B"))
+                if not isinstance(f, str):
+                    profile.bytes += len(values) * values.itemsize
+                if reservoir is not None:
+                    reservoir.update(values[0::2], values[1::2])
+                else:
+                    xs.extend(values[0::2])
+                    ys.extend(values[1::2])
+            if reservoir is not None:
+                xs, ys = reservoir.xs, reservoir.ys
+                bounds = reservoir.x_bounds, reservoir.y_bounds
+                seen = reservoir.seen
+        elif f and binary:
+            data = load_binary(f, binary, 2)
+            if not isinstance(f, str):
+                profile.bytes += data.size * 8 // (2 if binary == "f4" else 1)
+            xs, ys = data[:, 0], data[:, 1]
+        elif f and sample:
+            reservoir = Reservoir(sample)
+            columns, text = [xcol, ycol], ()
+            if colourcol is not None:
+                columns, text = [xcol, ycol, colourcol], (2,)
+            for batch in iter_columns(f, columns, delimiter, text, BATCH_SIZE):
+                reservoir.update(*batch)
+            xs, ys, cs = reservoir.xs, reservoir.ys, reservoir.colours or None
+            bounds = reservoir.x_bounds, reservoir.y_bounds
+            seen = reservoir.seen
+        elif f and backend == "numpy" and isinstance(f, str) and colourcol is None and \
+                str(xcol).isdigit() and str(ycol).isdigit():
+            try:
+                data = load_array(f, delimiter=delimiter, usecols=(int(xcol), int(ycol)))
+                xs, ys = data[:, 0], data[:, 1]
+            except ValueError:
+                # headers or quoted fields
+                xs, ys = read_columns(f, [xcol, ycol], delimiter)
+        elif f:
+            # only the selected columns are converted, straight into arrays
+            if colourcol is None:
+                xs, ys = read_columns(f, [xcol, ycol], delimiter)
+            else:
+                xs, ys, cs = read_columns(f, [xcol, ycol, colourcol], delimiter, text=(2,))
+        elif isinstance(xs, list) and isinstance(ys, list):
+            pass
+        elif backend == "numpy":
+            xs, ys = load_array(xs), load_array(ys)
         else:
-            data = [tuple(line.strip().split(',')) for line in f]
-        xs = [float(i[0]) for i in data]
-        ys = [float(i[1]) for i in data]
-        if len(data[0]) > 2:
-            cs = [i[2].strip() for i in data]
-    elif isinstance(xs, list) and isinstance(ys, list):
-        pass
-    else:
-        with open(xs) as fh:
-            xs = [float(str(row).strip()) for row in fh]
-        with open(ys) as fh:
-            ys = [float(str(row).strip()) for row in fh]
+            with open(xs) as fh:
+                xs = [float(str(row).strip()) for row in fh]
+            with open(ys) as fh:
+                ys = [float(str(row).strip()) for row in fh]
+    profile.values += len(xs) if seen is None else seen
 
-    graph = _plot_scatter(xs, ys, size, pch, title, x_title, y_title, txt_align, show_axes)
-    printcolour(graph, False, colour)
+    graph = _plot_scatter(xs, ys, size, pch, title, x_title, y_title, txt_align, show_axes, backend, density, cs,
+                          profile, bounds, braille)
+    with profile.phase("write"):
+        printcolour(graph, False, colour)
+    if on_profile is not None:
+        on_profile(profile)
     
 
 def main():
@@ -108,23 +413,59 @@ def main():
     parser.add_option('-t', '--title', help='title for the chart', default="", dest='t')
     parser.add_option('-x', help='x coordinates', default=None, dest='x')
     parser.add_option('-y', help='y coordinates', default=None, dest='y')
+    parser.add_option('--xcol', help='column of the file with the x coordinates, an index (from 0) or a header name',
+                      default='0', dest='xcol')
+    parser.add_option('--ycol', help='column of the file with the y coordinates (default 1)',
+                      default='1', dest='ycol')
+    parser.add_option('--colourcol', help='column of the file with the colour of each point',
+                      default=None, dest='colourcol')
+    parser.add_option('-d', '--delimiter', help='field separator of the file (default ,)',
+                      default=',', dest='delimiter')
     parser.add_option('-s', '--size', help='y coordinates', default=20, dest='size', type='int')
     parser.add_option('-p', '--pch', help='shape of point', default="x", dest='pch')
     parser.add_option('-c', '--colour', help='colour of the plot (%s)' %
                       colour_help, default='default', dest='colour')
-    parser.add_option('-xt', '--x_title', help="x axis title", default="My x axis", dest="xt")
-    parser.add_option('-yt', '--y_title', help="y axis title", default="My y axis", dest="yt")
+    parser.add_option('--x_title', help="x axis title", default="My x axis", dest="xt")
+    parser.add_option('--y_title', help="y axis title", default="My y axis", dest="yt")
     parser.add_option('-a', '--align', help='title alignment left, right \
-                                           or center as strings', defaul="center", dest='alg')
-    parser.add_option('h', '--axes', help='show 0-axes if values cross', default=False, dest="axs")
+                                           or center as strings', default="center", dest='alg')
+    parser.add_option('--axes', help='show 0-axes if values cross', default=False,
+                      action="store_true", dest="axs")
+    parser.add_option('--backend', help='computation backend (%s)' % backend_help,
+                      default='auto', dest='backend')
+    parser.add_option('--density', help='shade cells by the number of points in them',
+                      action='store_const', const='chars', default=None, dest='density')
+    parser.add_option('--density-colour', help='colour cells by the number of points in them',
+                      action='store_const', const='colour', dest='density')
+    parser.add_option('--braille', help='draw the points as Braille dots for 8 times the resolution',
+                      default=False, action='store_true', dest='braille')
+    parser.add_option('--sample', help='plot a uniform random sample of N points, reading the input in constant memory',
+                      type='int', default=None, dest='sample')
+    parser.add_option('--binary', help='read x,y pairs of little-endian binary values instead of text (%s)'
+                      % binary_help, default=None, dest='binary')
+    parser.add_option('--profile', help='report the time spent in each phase of the plot on stderr',
+                      action='store_const', const='human', default=None, dest='profile')
+    parser.add_option('--profile-json', help='report the time spent in each phase as JSON on stderr',
+                      action='store_const', const='json', dest='profile')
 
     opts, args = parser.parse_args()
 
+    if opts.binary and opts.binary not in BINARY_FORMATS:
+        parser.error("--binary must be one of: %s" % binary_help)
+    if opts.binary and opts.colourcol is not None:
+        parser.error("--binary cannot be combined with --colourcol")
+    if opts.braille and opts.density:
+        parser.error("--braille cannot be combined with --density")
     if opts.f is None and (opts.x is None or opts.y is None):
-        opts.f = sys.stdin.readlines()
+        opts.f = sys.stdin
 
     if opts.f or (opts.x and opts.y):
-        plot_scatter(opts.f, opts.x, opts.y, opts.size, opts.pch, opts.colour, opts.t, opts.xt, opts.yt, opts.alg, opts.axs)
+        on_profile = None
+        if opts.profile:
+            on_profile = lambda profile: profile.write(fmt=opts.profile)
+        plot_scatter(opts.f, opts.x, opts.y, opts.size, opts.pch, opts.colour, opts.t, opts.xt, opts.yt, opts.alg, opts.axs,
+                     opts.backend, opts.density, opts.xcol, opts.ycol, opts.colourcol,
+                     opts.delimiter.replace("\\t", "\t"), on_profile, opts.sample, opts.braille, opts.binary)
     else:
         print("nothing to plot!")
 
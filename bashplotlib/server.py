@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Resident plot server and thin client
+
+`bashplotlib serve` imports the plotting modules once and listens on a Unix
+domain socket. The `hist`, `hbar`, `scatter` and `timehist` commands first try to hand their
+arguments and stdin to that server, which forks a child per request and
+streams the rendered plot back, and only import the plotting code
+themselves when no server is running. This module is imported by every
+command, so it only uses the standard library and imports the plotting
+modules lazily.
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import sys
+import json
+import stat
+import time
+import signal
+import socket
+import struct
+import optparse
+import importlib
+import threading
+import traceback
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+# commands the server runs, by name
+COMMANDS = {
+    "hist": "bashplotlib.histogram",
+    "hbar": "bashplotlib.horizontal_histogram",
+    "scatter": "bashplotlib.scatterplot",
+    "timehist": "bashplotlib.timeseries",
+}
+
+# every frame sent back to the client is a channel byte and a payload length
+FRAME = struct.Struct("!BI")
+EXIT, STDOUT, STDERR = 0, 1, 2
+
+
+def socket_path():
+    """
+    Path of the server socket: $BASHPLOTLIB_SOCKET, or a per-user socket in
+    the private $XDG_RUNTIME_DIR, falling back to the temporary directory.
+    Setting BASHPLOTLIB_SOCKET to an empty string disables the server.
+    """
+    path = os.environ.get("BASHPLOTLIB_SOCKET")
+    if path is not None:
+        return path
+    tmp = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(tmp, "bashplotlib-%d.sock" % os.getuid())
+
+
+def _private_socket(path):
+    """
+    Whether path is a socket of ours that no other user can connect to. The
+    default path is guessable, so anyone could listen there first
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def _peer_uid(sock):
+    """
+    User id of the process listening at the other end of a Unix socket, None
+    where the platform cannot tell
+    """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+
+def _set_environ(env):
+    """
+    Replace the environment of this process, applying its time zone
+    """
+    os.environ.clear()
+    os.environ.update(env)
+    if hasattr(time, "tzset"):
+        time.tzset()
+
+
+class _FrameStream(object):
+    """
+    Text stream that sends everything written to it to the client
+    """
+
+    encoding = "utf-8"
+
+    def __init__(self, sock, channel):
+        self.sock = sock
+        self.channel = channel
+
+    def write(self, text):
+        data = text.encode(self.encoding)
+        if data:
+            self.sock.sendall(FRAME.pack(self.channel, len(data)) + data)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class _PlotHandler(socketserver.StreamRequestHandler):
+    """
+    Run one command in the forked child, with the connection as its stdin,
+    stdout and stderr
+    """
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # a connection only checking whether the server is up
+            return
+        request = json.loads(line.decode("utf-8"))
+        sock = self.connection
+        saved = sys.argv, sys.stdin, sys.stdout, sys.stderr
+        environ = dict(os.environ)
+        code = 0
+        try:
+            os.chdir(request["cwd"])
+            # the client's TZ, HOME, XDG_CACHE_HOME etc., so the plot is the
+            # same as when the command runs in the client's process
+            if "env" in request:
+                _set_environ(request["env"])
+            sys.argv = [request["command"]] + request["argv"]
+            sys.stdin = io.TextIOWrapper(self.rfile, encoding="utf-8")
+            sys.stdout = _FrameStream(sock, STDOUT)
+            sys.stderr = _FrameStream(sock, STDERR)
+            importlib.import_module(COMMANDS[request["command"]]).main()
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                code = e.code or 0
+            else:
+                sys.stderr.write("%s\n" % e.code)
+                code = 1
+        except Exception:
+            try:
+                traceback.print_exc()
+            except socket.error:
+                pass
+            code = 1
+        finally:
+            sys.argv, sys.stdin, sys.stdout, sys.stderr = saved
+            _set_environ(environ)
+        try:
+            sock.sendall(FRAME.pack(EXIT, 4) + struct.pack("!i", code))
+        except socket.error:
+            # the client went away, e.g. it was interrupted in --follow mode
+            pass
+
+
+class PlotServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server forking a child with the plotting modules already
+    imported for every request
+    """
+
+
+def serve(path=None):
+    """
+    Import the plotting modules and serve requests on the socket at path
+    until interrupted
+    """
+    path = path or socket_path()
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise RuntimeError("%s exists and is not a socket" % path)
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except socket.error:
+            # left behind by a server that did not shut down cleanly
+            os.remove(path)
+        else:
+            raise RuntimeError("a server is already listening on %s" % path)
+        finally:
+            probe.close()
+
+    for module in COMMANDS.values():
+        importlib.import_module(module)
+
+    # the server runs plots with our permissions, keep other users out
+    umask = os.umask(0o177)
+    try:
+        server = PlotServer(path, _PlotHandler)
+    finally:
+        os.umask(umask)
+    # clean up the socket when stopped with kill as well
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def _send_stdin(sock, stdin):
+    """
+    Forward stdin to the server as it arrives
+    """
+    try:
+        fd = stdin.fileno()
+    except (AttributeError, ValueError, io.UnsupportedOperation):
+        read = getattr(stdin, "read1", stdin.read)
+    else:
+        # unbuffered, so that a read still blocked at exit holds no locks
+        def read(size):
+            return os.read(fd, size)
+    try:
+        while True:
+            data = read(1 << 16)
+            if not data:
+                break
+            sock.sendall(data)
+        sock.shutdown(socket.SHUT_WR)
+    except (socket.error, ValueError):
+        # the server has finished without reading all of it
+        pass
+
+
+def forward(command, argv=None, stdin=None, stdout=None, stderr=None, path=None, env=None):
+    """
+    Run a command on the server and return its exit code, or None when no
+    server is running. Only a server of the same user is trusted with the
+    arguments, input and environment; any other socket at path is ignored.
+
+    Arguments:
+        command -- name of the command, a key of COMMANDS
+        argv -- its arguments, defaults to sys.argv[1:]
+        stdin -- binary file object forwarded to the command
+        stdout -- binary file object the plot is written to
+        stderr -- binary file object for errors
+        path -- socket of the server, see `socket_path`
+        env -- environment the command runs with, defaults to os.environ
+    """
+    path = path if path is not None else socket_path()
+    if not path or not _private_socket(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        peer = _peer_uid(sock)
+    except socket.error:
+        sock.close()
+        return None
+    if peer is not None and peer != os.getuid():
+        sock.close()
+        return None
+
+    if stdin is None:
+        stdin = sys.stdin.buffer
+    if stdout is None:
+        stdout = sys.stdout.buffer
+    if stderr is None:
+        stderr = sys.stderr.buffer
+    try:
+        request = {"command": command, "argv": sys.argv[1:] if argv is None else list(argv), "cwd": os.getcwd(),
+                   "env": dict(os.environ if env is None else env)}
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        pump = threading.Thread(target=_send_stdin, args=(sock, stdin))
+        pump.daemon = True
+        pump.start()
+
+        replies = sock.makefile("rb")
+        while True:
+            header = replies.read(FRAME.size)
+            if len(header) < FRAME.size:
+                stderr.write(b"bashplotlib server closed the connection\n")
+                return 1
+            channel, length = FRAME.unpack(header)
+            payload = replies.read(length)
+            if channel == EXIT:
+                return struct.unpack("!i", payload)[0]
+            stream = stdout if channel == STDOUT else stderr
+            stream.write(payload)
+            stream.flush()
+    finally:
+        sock.close()
+
+
+def _run(command):
+    """
+    Run a command on the server if there is one, in this process otherwise
+    """
+    code = forward(command)
+    if code is not None:
+        sys.exit(code)
+    importlib.import_module(COMMANDS[command]).main()
+
+
+def hist():
+    _run("hist")
+
+
+def hbar():
+    _run("hbar")
+
+
+def scatter():
+    _run("scatter")
+
+
+def timehist():
+    _run("timehist")
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog serve [options]\n\n"
+                                   "Keep the plotting code loaded and run the plotting commands for them,\n"
+                                   "so every call skips the interpreter and import startup.")
+    parser.add_option('--socket', help='path of the Unix socket (default %s)' % socket_path(),
+                      default=None, dest='socket')
+    opts, args = parser.parse_args()
+
+    if args != ["serve"]:
+        parser.error("expected the serve command")
+    try:
+        serve(opts.socket)
+    except RuntimeError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Plotting terminal based time series of timestamped values
+"""
+
+from __future__ import print_function
+from __future__ import division
+
+import sys
+import time
+import optparse
+import threading
+from datetime import datetime
+from .utils.helpers import *
+from .utils.canvas import Canvas
+from .utils.redraw import Redrawer
+from .utils.stats import TimeBuckets
+from .utils.commandhelp import timehist
+
+# sparkline characters from low to high
+SPARK_CHARS = u"▁▂▃▄▅▆▇█"
+
+# seconds per duration suffix
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text):
+    """
+    Turn "90", "30s", "5m", "1h" or "1d" into seconds
+    """
+    text = str(text).strip()
+    scale = DURATIONS.get(text[-1:].lower())
+    seconds = float(text[:-1] if scale else text) * (scale or 1)
+    if seconds <= 0:
+        raise ValueError("durations must be positive, got %r" % text)
+    return seconds
+
+
+def parse_timestamp(text):
+    """
+    Seconds since the epoch of a unix timestamp or an ISO 8601 date and time;
+    times without a timezone are local time
+    """
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text.strip().replace("Z", "+00:00")).timestamp()
+
+
+def parse_event(line, delimiter=","):
+    """
+    Turn a "timestamp,value" line into a (time, value) pair. A line with only
+    a timestamp counts as an event with value 1; returns None for lines
+    that cannot be parsed.
+    """
+    fields = line.strip().split(delimiter)
+    try:
+        t = parse_timestamp(fields[0])
+        value = float(fields[1]) if len(fields) > 1 and fields[1].strip() else 1.0
+    except ValueError:
+        return None
+    return t, value
+
+
+def read_events(f, data, delimiter=","):
+    """
+    Add the events in a file name, file object or iterable of lines to a
+    TimeBuckets
+    """
+    if isinstance(f, str):
+        with open(f) as fh:
+            return read_events(fh, data, delimiter)
+    for line in f:
+        event = parse_event(line, delimiter)
+        if event is not None:
+            data.add(*event)
+    return data
+
+
+def sparkline(values):
+    """
+    One character per value, scaled from min(0, lowest value) to the
+    highest value; None values are left blank
+    """
+    known = [v for v in values if v is not None]
+    if not known:
+        return " " * len(values)
+    lo, hi = min(0, min(known)), max(known)
+    top = len(SPARK_CHARS) - 1
+    chars = []
+    for v in values:
+        if v is None:
+            chars.append(" ")
+        elif hi == lo:
+            chars.append(SPARK_CHARS[0])
+        else:
+            chars.append(SPARK_CHARS[int(round((v - lo) / (hi - lo) * top))])
+    return "".join(chars)
+
+
+def _time_format(data):
+    """
+    strftime format for the bucket labels
+    """
+    if data.width >= 86400:
+        return "%Y-%m-%d"
+    if data.width * data.size >= 86400:
+        return "%m-%d %H:%M"
+    if data.width < 60:
+        return "%H:%M:%S"
+    return "%H:%M"
+
+
+def draw_buckets(data, stat="count", width=40, pch="o", colour="default", title=""):
+    """
+    Draw a TimeBuckets as one horizontal bar per bucket into a Canvas
+
+    Arguments:
+        data -- the TimeBuckets to draw
+        stat -- "count", "sum" or "mean" of every bucket
+        width -- length of the longest bar
+        pch -- shape of the bars in the plot
+        colour -- colour of the bars in the terminal
+        title -- title at the top of the plot
+    """
+    series = data.series(stat)
+    fmt = _time_format(data)
+    labels = [time.strftime(fmt, time.localtime(start)) for start, _ in series]
+    top = max([abs(v) for _, v in series if v is not None] or [0])
+    nlen = max([len(label) for label in labels] or [0])
+
+    canvas = Canvas()
+    if title:
+        canvas.draw(box_text([title], width + 2, 1, "center", nlen) + "\n")
+    canvas.draw("%s per %gs bucket\n" % (stat, data.width))
+    for label, (_, value) in zip(labels, series):
+        canvas.draw(label.rjust(nlen) + "| ")
+        if value is None:
+            canvas.newline()
+            continue
+        # bars start at 0, negative means are shown by their value only
+        length = int(round(value / top * width)) if top and value > 0 else 0
+        canvas.draw(pch * length, colour)
+        canvas.draw(" " * (width - length) + " %g\n" % value)
+    return canvas
+
+
+def draw_sparkline(data, stat="count", colour="default", title=""):
+    """
+    Draw a TimeBuckets as a one line sparkline into a Canvas
+    """
+    values = [v for _, v in data.series(stat)]
+    known = [v for v in values if v is not None]
+    canvas = Canvas()
+    if title:
+        canvas.draw(title + " ")
+    canvas.draw(sparkline(values), colour)
+    if known:
+        canvas.draw("  last %g, max %g %s per %gs" % (known[-1], max(known), stat, data.width))
+    canvas.newline()
+    return canvas
+
+
+def plot_timeseries(f, bucket=60.0, buckets=60, stat="count", spark=False, width=40, pch="o",
+                    colour="default", title="", delimiter=","):
+    """
+    Plot timestamped values aggregated into fixed time buckets
+
+    Arguments:
+        f -- a file name, file object or list of "timestamp,value" lines; the
+             timestamp is unix time or ISO 8601, lines without a value count
+             as 1
+        bucket -- width of every bucket in seconds
+        buckets -- number of buckets kept, ending with the newest timestamp
+        stat -- "count", "sum" or "mean" of the values in every bucket
+        spark -- boolean value for whether or not to draw a one line sparkline
+        width -- length of the longest bar
+        pch -- shape of the bars in the plot
+        colour -- colour of the bars in the terminal
+        title -- title of the plot
+        delimiter -- separator between the timestamp and the value
+    """
+    if pch is None:
+        pch = "o"
+    data = read_events(f, TimeBuckets(bucket, buckets), delimiter)
+    if spark:
+        canvas = draw_sparkline(data, stat, colour, title)
+    else:
+        canvas = draw_buckets(data, stat, width, pch, colour, title)
+    canvas.write()
+    return data
+
+
+def follow_timeseries(stream, interval=1.0, bucket=60.0, buckets=60, stat="count", spark=False, width=40,
+                      pch="o", colour="default", title="", delimiter=",", out=None):
+    """
+    Plot the events of a stream that is still being written to, redrawing
+    in place every interval seconds until the stream ends. The window moves
+    with the clock, so quiet periods show up as empty buckets.
+
+    Arguments:
+        stream -- file object with "timestamp,value" lines
+        interval -- seconds between redraws
+        out -- file object to draw to, defaults to stdout
+    The remaining arguments are the same as for plot_timeseries.
+    """
+    if pch is None:
+        pch = "o"
+    lock = threading.Lock()
+    done = threading.Event()
+    data = TimeBuckets(bucket, buckets)
+    errors = []
+
+    def consume():
+        # a failing read ends the redraws too, and is raised below
+        try:
+            for line in stream:
+                event = parse_event(line, delimiter)
+                if event is not None:
+                    with lock:
+                        data.add(*event)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    reader = threading.Thread(target=consume)
+    reader.daemon = True
+    reader.start()
+
+    screen = Redrawer(out)
+    while True:
+        finished = done.wait(interval)
+        with lock:
+            data.advance(time.time())
+            if spark:
+                frame = draw_sparkline(data, stat, colour, title).render()
+            else:
+                frame = draw_buckets(data, stat, width, pch, colour, title).render()
+        # only the cells that changed since the previous frame are sent
+        screen.draw(frame)
+        if finished:
+            break
+    if errors:
+        raise errors[0]
+
+
+def main():
+    parser = optparse.OptionParser(usage=timehist['usage'])
+    parser.add_option('-f', '--file', help='a file with timestamp,value lines', default=None, dest='f')
+    parser.add_option('-t', '--title', help='title for the chart', default="", dest='t')
+    parser.add_option('-b', '--bucket', help='width of the time buckets, e.g. 10s, 1m or 1h (default 1m)',
+                      default='1m', dest='bucket')
+    parser.add_option('-n', '--buckets', help='number of buckets to show (default 60)',
+                      type='int', default=60, dest='buckets')
+    parser.add_option('--stat', help='value of every bucket: count, sum or mean (default count)',
+                      default='count', dest='stat')
+    parser.add_option('--spark', help='draw a one line sparkline instead of bars',
+                      default=False, action='store_true', dest='spark')
+    parser.add_option('-s', '--size', help='length of the longest bar', type='int', default=40, dest='size')
+    parser.add_option('-p', '--pch', help='shape of each bar', default='o', dest='p')
+    parser.add_option('-c', '--colour', help='colour of the plot (%s)' %
+                      colour_help, default='default', dest='colour')
+    parser.add_option('-d', '--delimiter', help='separator between timestamp and value (default ,)',
+                      default=',', dest='delimiter')
+    parser.add_option('--follow', help='keep reading the input and redraw as it grows, the buckets move with the clock',
+                      default=False, action='store_true', dest='follow')
+    parser.add_option('--interval', help='seconds between redraws in --follow mode',
+                      type='float', default=1.0, dest='interval')
+
+    opts, args = parser.parse_args()
+
+    if opts.stat not in TimeBuckets.STATS:
+        parser.error("--stat must be one of: %s" % ", ".join(TimeBuckets.STATS))
+    try:
+        bucket = parse_duration(opts.bucket)
+    except ValueError:
+        parser.error("invalid bucket width: %r" % opts.bucket)
+
+    if opts.f is None:
+        opts.f = args[0] if args else sys.stdin
+
+    if opts.follow:
+        stream = open(opts.f) if isinstance(opts.f, str) else opts.f
+        try:
+            follow_timeseries(stream, opts.interval, bucket, opts.buckets, opts.stat, opts.spark, opts.size,
+                              opts.p, opts.colour, opts.t, opts.delimiter)
+        except KeyboardInterrupt:
+            pass
+    else:
+        plot_timeseries(opts.f, bucket, opts.buckets, opts.stat, opts.spark, opts.size, opts.p, opts.colour,
+                        opts.t, opts.delimiter)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Optional NumPy accelerated backend for bashplotlib
+"""
+
+from __future__ import division
+
+import os
+
+from .braille import DOTS, dot_scale
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BACKENDS = ("auto", "python", "numpy")
+
+backend_help = ', '.join(BACKENDS)
+
+
+def resolve_backend(backend):
+    """
+    Turn a backend name into "numpy" or "python". "auto" (or None) picks
+    numpy whenever it can be imported
+    """
+    if backend is None or backend == "auto":
+        return "numpy" if np is not None else "python"
+    if backend not in BACKENDS:
+        raise ValueError("unknown backend %r, expected one of: %s" % (backend, backend_help))
+    if backend == "numpy" and np is None:
+        raise ImportError("the numpy backend requires numpy to be installed")
+    return backend
+
+
+def load_array(f, delimiter=None, usecols=None):
+    """
+    Bulk load numbers from a file name, file object or iterable of lines
+    or numbers into a float array
+    """
+    if isinstance(f, str) or hasattr(f, "read"):
+        return np.loadtxt(f, dtype=float, delimiter=delimiter, usecols=usecols, ndmin=2 if usecols else 1)
+    if isinstance(f, np.ndarray):
+        return f.astype(float, copy=False)
+    return np.array(list(f), dtype=float)
+
+
+def load_sidecar(path):
+    """
+    Memory map a cache sidecar of native doubles, see `cache.cache_file`
+    """
+    if not os.path.getsize(path):
+        return np.zeros(0)
+    return np.memmap(path, dtype=float, mode="r")
+
+
+def load_binary(f, fmt="f8", columns=None):
+    """
+    View little-endian float32 ("f4") or float64 ("f8") binary input as an
+    array, memory mapping file names. float32 values are widened to float64
+    so the summaries are computed at full precision. With columns the
+    values are interleaved records of that many columns, e.g. 2 for x,y.
+    """
+    dtype = np.dtype("<" + fmt)
+    record = dtype.itemsize * (columns or 1)
+    if isinstance(f, str):
+        size = os.path.getsize(f)
+        if size % record:
+            raise ValueError("%s does not hold a whole number of %d byte records" % (f, record))
+        values = np.memmap(f, dtype=dtype, mode="r") if size else np.zeros(0, dtype=dtype)
+    else:
+        data = getattr(f, "buffer", f).read()
+        if len(data) % record:
+            raise ValueError("the input ends with a partial %d byte record" % record)
+        values = np.frombuffer(data, dtype=dtype)
+    if fmt != "f8":
+        values = values.astype(float)
+    return values.reshape(-1, columns) if columns else values
+
+
+def array_summary(values):
+    """
+    Return n, min, max, mean and sample standard deviation of an array
+    """
+    n = int(values.size)
+    sd = float(values.std(ddof=1)) if n > 1 else 0.0
+    return n, float(values.min()), float(values.max()), float(values.mean()), sd
+
+
+def array_bin_counts(values, bins, max_val):
+    """
+    Count values per bin with the same edge rules as `BinLookup`
+    """
+    nbins = len(bins)
+    index = np.searchsorted(np.asarray(bins, dtype=float), values, side="left")
+    if max_val > bins[-1]:
+        index[values == max_val] = nbins - 1
+    return np.bincount(index, minlength=nbins + 1)[:nbins].tolist()
+
+
+def point_cells(xs, ys, x_scale, y_scale, axis_row=None, axis_col=None):
+    """
+    Map scatter points to grid cells, see `scatterplot._point_cells`
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    nrows, ncols = len(y_scale), len(x_scale)
+    # first column whose x is >= the point and first row (top down) whose
+    # y is <= the point
+    cols = np.digitize(xs, np.asarray(x_scale, dtype=float), right=True)
+    rows = nrows - np.digitize(ys, np.asarray(y_scale[::-1], dtype=float))
+    placed = (cols < ncols) & (rows < nrows)
+    occupied = set(
+        divmod(int(cell), ncols) for cell in np.unique(rows[placed] * ncols + cols[placed])
+    )
+
+    axis_targets = {}
+    on_axis = np.zeros(len(xs), dtype=bool)
+    if axis_row is not None:
+        on_axis |= rows == axis_row
+    if axis_col is not None:
+        on_axis |= cols == axis_col
+    for i in np.flatnonzero(on_axis & placed).tolist():
+        cell = (int(rows[i]), int(cols[i]))
+        axis_targets.setdefault(cell, []).append(i)
+    return occupied, axis_targets
+
+
+def cell_counts(xs, ys, x_scale, y_scale):
+    """
+    Count scatter points per grid cell, see `scatterplot._cell_counts`
+    """
+    nrows, ncols = len(y_scale), len(x_scale)
+    cols = np.digitize(xs, np.asarray(x_scale, dtype=float), right=True)
+    rows = nrows - np.digitize(ys, np.asarray(y_scale[::-1], dtype=float))
+    placed = (cols < ncols) & (rows < nrows)
+    counts = np.bincount(rows[placed] * ncols + cols[placed], minlength=nrows * ncols)
+    return dict((divmod(int(cell), ncols), int(counts[cell])) for cell in np.flatnonzero(counts))
+
+
+def array_sketch(values, sketch):
+    """
+    Add an array of values to a QuantileSketch
+    """
+    def bucket_counts(magnitudes):
+        keys = np.ceil(np.log(magnitudes) / sketch.log_gamma).astype(np.int64)
+        keys, counts = np.unique(keys, return_counts=True)
+        return dict(zip(keys.tolist(), counts.tolist()))
+
+    if not values.size:
+        return
+    sketch.add_counts(bucket_counts(values[values > 0]), bucket_counts(-values[values < 0]),
+                      int((values == 0).sum()), int(values.size), float(values.min()), float(values.max()))
+
+
+def braille_cells(xs, ys, x_bounds, y_bounds, width, height):
+    """
+    Dot patterns of a Braille raster of the points, see
+    `braille.BrailleCanvas.plot`
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    x0, x_scale = dot_scale(x_bounds, width * 2)
+    y0, y_scale = dot_scale(y_bounds, height * 4)
+    # truncated towards zero like int() in the python version
+    px = ((xs - x0) * x_scale + 0.5).astype(np.int64)
+    py = height * 4 - 1 - ((ys - y0) * y_scale + 0.5).astype(np.int64)
+    keep = (px >= 0) & (px < width * 2) & (py >= 0) & (py < height * 4)
+    px, py = px[keep], py[keep]
+    cell = (py >> 2) * width + (px >> 1)
+    dot = (py & 3) * 2 + (px & 1)
+    cells = np.zeros(width * height, dtype=np.uint8)
+    # one pass per dot, setting the same bit twice is harmless
+    for i, bit in enumerate(bit for row in DOTS for bit in row):
+        cells[cell[dot == i]] |= bit
+    return bytearray(cells.tobytes())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Bit-packed Braille raster for high resolution plots
+"""
+
+from __future__ import division
+
+# bit of every dot of a Braille character by (row, column) of its 2x4 dots
+DOTS = ((0x01, 0x08), (0x02, 0x10), (0x04, 0x20), (0x40, 0x80))
+
+# character of every dot pattern, with a space for no dots
+CHARS = [" "] + [chr(0x2800 + bits) for bits in range(1, 256)]
+
+
+def dot_scale(bounds, dots):
+    """
+    Offset and factor mapping values within bounds onto dots positions
+    """
+    lo, hi = bounds
+    return lo, (dots - 1) / (hi - lo) if hi > lo else 0.0
+
+
+class BrailleCanvas(object):
+    """
+    A raster of width x height characters with 2x4 dots each. Every
+    character is one byte of a bytearray holding its dot pattern, so
+    setting a dot is a single bit operation and a row of output is a
+    lookup per byte.
+    """
+
+    __slots__ = ("width", "height", "cells")
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+
+    @property
+    def dot_width(self):
+        return self.width * 2
+
+    @property
+    def dot_height(self):
+        return self.height * 4
+
+    def set(self, x, y):
+        """
+        Set the dot in column x and row y (from the top)
+        """
+        self.cells[(y >> 2) * self.width + (x >> 1)] |= DOTS[y & 3][x & 1]
+
+    def plot(self, xs, ys, x_bounds, y_bounds, colours=None):
+        """
+        Set the dot nearest to every point, scaling x_bounds and y_bounds to
+        the full raster. Returns the colour of the first point in every
+        character, by cell index, when colours are given.
+        """
+        x0, x_scale = dot_scale(x_bounds, self.dot_width)
+        y0, y_scale = dot_scale(y_bounds, self.dot_height)
+        top = self.dot_height - 1
+        nx, ny = self.dot_width, self.dot_height
+        cells, width = self.cells, self.width
+        cell_colours = {}
+        if colours is None:
+            for x, y in zip(xs, ys):
+                px = int((x - x0) * x_scale + 0.5)
+                py = top - int((y - y0) * y_scale + 0.5)
+                if 0 <= px < nx and 0 <= py < ny:
+                    cells[(py >> 2) * width + (px >> 1)] |= DOTS[py & 3][px & 1]
+            return cell_colours
+        for i, (x, y) in enumerate(zip(xs, ys)):
+            px = int((x - x0) * x_scale + 0.5)
+            py = top - int((y - y0) * y_scale + 0.5)
+            if 0 <= px < nx and 0 <= py < ny:
+                cell = (py >> 2) * width + (px >> 1)
+                cells[cell] |= DOTS[py & 3][px & 1]
+                if cell not in cell_colours:
+                    cell_colours[cell] = colours[i]
+        return cell_colours
+
+    def axes(self, x_bounds, y_bounds):
+        """
+        Draw the lines x=0 and y=0 where they lie within the bounds
+        """
+        x0, x_scale = dot_scale(x_bounds, self.dot_width)
+        y0, y_scale = dot_scale(y_bounds, self.dot_height)
+        if x_bounds[0] < 0 < x_bounds[1]:
+            px = int((0 - x0) * x_scale + 0.5)
+            for py in range(self.dot_height):
+                self.set(px, py)
+        if y_bounds[0] < 0 < y_bounds[1]:
+            py = self.dot_height - 1 - int((0 - y0) * y_scale + 0.5)
+            for px in range(self.dot_width):
+                self.set(px, py)
+
+    def rows(self):
+        """
+        Yield the rows of characters from the top
+        """
+        width, lookup = self.width, CHARS.__getitem__
+        for start in range(0, len(self.cells), width):
+            yield "".join(map(lookup, self.cells[start:start + width]))
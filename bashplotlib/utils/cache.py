@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache of parsed input files for bashplotlib
+"""
+
+import os
+import mmap
+import hashlib
+import tempfile
+from array import array
+
+from .readers import CHUNK_SIZE, read_number_batches
+
+# the parsed values of a file are kept as native doubles in a sidecar
+SUFFIX = ".f8"
+# total size the cache directory is trimmed to
+MAX_CACHE_BYTES = 1 << 30
+
+
+def default_cache_dir():
+    """
+    ~/.cache/bashplotlib, or the same under $XDG_CACHE_HOME
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "bashplotlib")
+
+
+def sidecar_path(path, cache_dir):
+    """
+    Name of the sidecar of a file, keyed on its path, size and
+    modification time so that a changed file is parsed again
+    """
+    st = os.stat(path)
+    key = "%s\0%d\0%d" % (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+    return os.path.join(cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + SUFFIX)
+
+
+def evict(cache_dir, max_bytes=MAX_CACHE_BYTES, keep=None):
+    """
+    Remove the least recently used sidecars until the cache directory holds
+    at most max_bytes, never removing `keep`
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(SUFFIX):
+            full = os.path.join(cache_dir, name)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, full))
+    total = sum(size for _, size, _ in entries)
+    for _, size, full in sorted(entries):
+        if total <= max_bytes:
+            break
+        if full == keep:
+            continue
+        try:
+            os.remove(full)
+        except OSError:
+            continue
+        total -= size
+
+
+def cache_file(path, cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+    """
+    Return the sidecar with the parsed values of path, parsing the file
+    into it if it is not cached yet
+
+    Arguments:
+        path -- name of a file with whitespace separated numbers
+        cache_dir -- directory of the sidecars, see `default_cache_dir`
+        max_bytes -- size the cache directory is trimmed to after a miss
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    sidecar = sidecar_path(path, cache_dir)
+    if os.path.exists(sidecar):
+        # hits count as a use for the least recently used eviction
+        os.utime(sidecar, None)
+        return sidecar
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    # written under a temporary name so readers never see a partial sidecar
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for batch in read_number_batches(path):
+                batch.tofile(fh)
+        os.replace(tmp, sidecar)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    evict(cache_dir, max_bytes, keep=sidecar)
+    return sidecar
+
+
+def cached_batches(path, cache_dir=None, max_bytes=MAX_CACHE_BYTES, chunk_size=CHUNK_SIZE):
+    """
+    Yield the numbers in a file as array('d') batches like
+    `read_number_batches`, reading them from the memory mapped sidecar
+    """
+    sidecar = cache_file(path, cache_dir, max_bytes)
+    with open(sidecar, "rb") as fh:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # no numbers, empty files cannot be mapped
+            return
+        try:
+            step = chunk_size - chunk_size % 8
+            for start in range(0, len(mm), step):
+                batch = array('d')
+                batch.frombytes(mm[start:start + step])
+                yield batch
+        finally:
+            mm.close()
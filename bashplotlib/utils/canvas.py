@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Buffered drawing surface for bashplotlib plots
+"""
+
+import sys
+
+from .helpers import bcolours, get_colour
+
+
+class Canvas(object):
+    """
+    A frame that plots are drawn into before being written out. Text is
+    added as runs with an optional colour; consecutive runs of the same
+    colour share a single escape sequence and the finished frame is written
+    with one call.
+    """
+
+    def __init__(self):
+        # each line is a list of [colour, text] runs
+        self.lines = [[]]
+
+    def draw(self, text, colour=None):
+        """
+        Append text to the frame, a colour of None leaves it uncoloured
+        """
+        parts = text.split("\n")
+        for i, part in enumerate(parts):
+            if i > 0:
+                self.lines.append([])
+            if not part:
+                continue
+            runs = self.lines[-1]
+            if runs and runs[-1][0] == colour:
+                runs[-1][1] += part
+            else:
+                runs.append([colour, part])
+
+    def newline(self):
+        """
+        Start a new line
+        """
+        self.lines.append([])
+
+    def render(self, colour=True):
+        """
+        Return the frame as a string, without escape codes if colour is False
+        """
+        out = []
+        for i, runs in enumerate(self.lines):
+            if i > 0:
+                out.append("\n")
+            for run_colour, text in runs:
+                if colour and run_colour is not None:
+                    out.append(get_colour(run_colour) + text + bcolours["ENDC"])
+                else:
+                    out.append(text)
+        return "".join(out)
+
+    def write(self, stream=None):
+        """
+        Write the frame in a single call
+        """
+        if stream is None:
+            stream = sys.stdout
+        stream.write(self.render())
+        stream.flush()
+
+    def __str__(self):
+        return self.render()
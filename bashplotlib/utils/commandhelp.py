@@ -16,6 +16,37 @@ hist = {
     """
 }
 
+hbar = {
+    "usage": """hbar is a command for making horizontal histograms, with one bin per line. it takes the same
+    input and options as hist:
+        1) txt file w/ 1 column of numbers
+        2) standard in piped from another command line cat or curl
+
+    hbar -f <file> -s <length of the bars>
+    """
+}
+
+timehist = {
+    "usage": """timehist is a command for plotting timestamped values in fixed time buckets. it accepts lines of
+    timestamp,value (the timestamp in unix time or ISO 8601, lines with only a timestamp count as 1 event):
+        1) txt file w/ timestamp,value lines
+        2) standard in piped from another command line cat or tail -f
+
+    timehist -f <file> -b 1m -n 60
+    tail -f <log> | timehist --follow --spark -b 10s
+    """
+}
+
+dashboard = {
+    "usage": """dashboard is a command for watching several inputs at once, with one plot per input laid out in a grid.
+    every input is a file, named pipe or - for standard in, optionally prefixed with the kind of plot:
+        1) hist:<file> (the default) or hbar:<file> w/ 1 column of numbers
+        2) scatter:<file> w/ 2 comma seperated columns of x,y values
+
+    mkfifo latency; dashboard latency scatter:points.csv --fps 2
+    """
+}
+
 scatter = {
     "usage": """scatterplot is a command for making xy plots. it accepts a series of x values and a series of y values in the
     following formats:
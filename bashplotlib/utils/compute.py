@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Histogram computation shared by the vertical and horizontal histograms
+"""
+
+from __future__ import division
+
+import os
+import math
+from array import array
+from .helpers import drange
+from .stats import StreamingHistogram, exact_bin_counts
+from .readers import read_binary_batches, read_number_batches, read_weighted_batches
+from .cache import cache_file, cached_batches
+from .parallel import parallel_bin_counts, parallel_read
+from .sketch import QuantileSketch
+from .profiling import Profile
+from .backends import (array_bin_counts, array_sketch, array_summary, load_array, load_binary, load_sidecar,
+                       resolve_backend)
+
+
+def calc_bins(n, min_val, max_val, h=None, binwidth=None):
+    """
+    Calculate number of bins for the histogram
+    """
+
+    # This process is just calculating how many variables fall
+    # on certain intervals
+    if not h:
+        h = max(10, math.log(n + 1, 2))
+    # Calculating the size of the intervals
+    if binwidth == 0:
+        binwidth = 0.1
+    if binwidth is None:
+        binwidth = (max_val - min_val) / h
+    # Calculating the intervals with previously calculate interval size
+    # In our data's range (min, max)
+    for b in drange(min_val, max_val, step=binwidth, include_stop=True):
+        if b.is_integer():
+            yield int(b)
+        else:
+            yield b
+
+
+def read_numbers(numbers):
+    """
+    Read the input data in the most optimal way
+    """
+    for batch in read_number_batches(numbers):
+        for number in batch:
+            yield number
+
+
+def load_values(f, binary=None, cache_dir=None):
+    """
+    Load the numbers of f into an array for the numpy backend. Binary input
+    is memory mapped and a file name with a cache_dir is read from its
+    sidecar, see `compute_hist`
+    """
+    if binary:
+        return load_binary(f, binary)
+    if cache_dir and isinstance(f, str):
+        return load_sidecar(cache_file(f, cache_dir))
+    return load_array(f)
+
+
+def _rereadable(f):
+    """
+    Whether f can be read a second time: a file name or a list of values
+    """
+    return isinstance(f, (str, list, tuple))
+
+
+def weighted_batches(f, weights, profile=None):
+    """
+    Yield (values, counts) batches of f and weights, see `compute_hist`
+    """
+    if weights is True:
+        for batch in read_weighted_batches(f, profile=profile):
+            yield batch
+        return
+    values, counts = array('d'), array('d')
+    for batch in read_number_batches(f, profile=profile):
+        values.extend(batch)
+    for batch in read_number_batches(weights):
+        counts.extend(batch)
+    if len(values) != len(counts):
+        raise ValueError("got %d values but %d weights" % (len(values), len(counts)))
+    yield values, counts
+
+
+class HistogramResult(object):
+    """
+    A computed histogram, ready to be drawn by any of the renderers: the bin
+    edges, the count in every bin and the summary of the values
+    """
+
+    def __init__(self, edges, counts, n, min_val, max_val, mean, sd, quantiles=None):
+        self.edges = edges
+        self.counts = counts
+        self.n = n
+        self.min = min_val
+        self.max = max_val
+        self.mean = mean
+        self.sd = sd
+        self.quantiles = quantiles
+
+    @classmethod
+    def from_histogram(cls, data, bincount=None, binwidth=None, quantiles=None, recount=None):
+        """
+        Choose the bins of a StreamingHistogram and count the values in them.
+        Once the values have been pooled its counts are approximate, so
+        recount, when given, is called with the edges to count the input
+        again exactly
+        """
+        stats = data.stats
+        edges = list(calc_bins(stats.n, stats.min, stats.max, bincount, binwidth))
+        counts = recount(edges) if recount is not None and not data.exact else data.bin_counts(edges)
+        # counts are fractional once a decay has been applied
+        counts = [int(round(count)) for count in counts]
+        return cls(edges, counts, stats.n, stats.min, stats.max, stats.mean, stats.sd, quantiles)
+
+    @classmethod
+    def from_state(cls, state, percentiles=None):
+        """
+        Result of a HistogramState, with percentiles from its sketch
+        """
+        quantiles = None
+        if percentiles:
+            if state.sketch is None:
+                raise ValueError("percentiles need a histogram state with a quantile sketch")
+            quantiles = state.sketch.percentiles(percentiles)
+        stats = state.stats
+        counts = [int(round(count)) for count in state.counts]
+        return cls(state.bins, counts, stats.n, stats.min, stats.max, stats.mean, stats.sd, quantiles)
+
+    def summary_lines(self):
+        """
+        Lines of the summary box
+        """
+        lines = [
+            "Summary",
+            "observations: %d" % self.n,
+            "min value: %f" % self.min,
+            "mean : %f" % self.mean,
+            "std dev : %f" % self.sd,
+        ]
+        for p in sorted(self.quantiles or {}):
+            lines.append("p%g : %f" % (p, self.quantiles[p]))
+        lines.append("max value: %f" % self.max)
+        return lines
+
+
+def compute_hist(f, bincount=None, binwidth=None, backend="auto", percentiles=None, workers=None,
+                 cache_dir=None, profile=None, weights=None, binary=None):
+    """
+    Read the numbers in f and compute their histogram
+
+    Arguments:
+        f -- a file name, file object or iterable of numbers; file objects
+             and iterators are only read once, so past 16384 distinct values
+             their bin counts are approximate (see `StreamingHistogram`)
+        bincount -- number of bins in the histogram
+        binwidth -- width of bins in the histogram
+        backend -- "python", "numpy" or "auto" (numpy when installed)
+        percentiles -- list of percentiles (e.g. [50, 99, 99.9]) to estimate,
+                       within 1% of the exact values
+        workers -- number of processes to parse a file name with, each one
+                   reading a part of the file (uses the python backend)
+        cache_dir -- directory to cache the parsed values of a file name in;
+                     later reads of the unchanged file skip the parsing
+        profile -- a `profiling.Profile` to add the time of every phase to
+        weights -- the number of times each value in f occurred, or True when
+                   f has a value and its count on every line ("value,count");
+                   weighted input is read with the python backend
+        binary -- "f4" or "f8" when f (a file name or binary stream) holds
+                  little-endian float32 or float64 values instead of text
+    """
+    # n is the number of numbers in our data. The summary statistics are
+    # accumulated as the numbers stream in and the values are counted in
+    # bounded memory, so the bins can be chosen afterwards. Past max_bins
+    # distinct values those counts are pooled and approximate, then file
+    # names and lists are read a second time to count them into the bins
+    # exactly; only streams such as stdin keep the approximation. The
+    # numpy backend loads the whole column into an array instead.
+    # percentiles are estimated with a bounded memory sketch while reading
+    if profile is None:
+        profile = Profile()
+    sketch = QuantileSketch() if percentiles else None
+
+    # a file name can be split between worker processes, which parse their
+    # part with the python engine. A cached file is not parsed at all.
+    # binary input is used as it is, without parsing or caching
+    weighted = weights is not None
+    if weighted and binary:
+        raise ValueError("weights cannot be combined with binary input")
+    cached = bool(cache_dir and isinstance(f, str)) and not weighted and not binary
+    parallel = bool(workers and workers > 1 and isinstance(f, str)) and not cached and not weighted and not binary
+    backend = "python" if parallel or weighted else resolve_backend(backend)
+    if backend == "numpy":
+        # numpy reads and parses in a single call
+        with profile.phase("read" if binary else "parse"):
+            data = load_values(f, binary, cache_dir if cached else None)
+        profile.values += data.size
+        if isinstance(f, str):
+            profile.bytes += os.path.getsize(f)
+        with profile.phase("stats"):
+            n, min_val, max_val, mean, sd = array_summary(data)
+            if sketch is not None:
+                array_sketch(data, sketch)
+
+        with profile.phase("bin"):
+            # Calculating the bins for our graph. What are bins? Intervals of
+            # our data range. We will count how many elements fall on each interval
+            # and use those counts to print our graph. (sütunlar için)
+            bins = list(calc_bins(n, min_val, max_val, bincount, binwidth))
+
+            # We count the number of elements in every interval
+            counts = array_bin_counts(data, bins, max_val)
+        quantiles = sketch.percentiles(percentiles) if sketch is not None else None
+        return HistogramResult(bins, counts, n, min_val, max_val, mean, sd, quantiles)
+
+    # counts f again into the final bins, for input that can be read twice
+    recount = None
+    if parallel:
+        # the workers read, parse and count their parts in one go
+        with profile.phase("parse"):
+            data, sketch = parallel_read(f, workers, sketch is not None)
+        profile.values += data.stats.n
+        profile.bytes += os.path.getsize(f)
+        recount = lambda edges: parallel_bin_counts(f, workers, edges, data.stats.max)
+    elif weighted:
+        # pre-aggregated counts go straight into the bins and moments
+        data = StreamingHistogram()
+        for values, counts in weighted_batches(f, weights, profile):
+            with profile.phase("stats"):
+                data.update(values, counts)
+                if sketch is not None:
+                    sketch.update(values, counts)
+            profile.values += len(values)
+        if _rereadable(f) and (weights is True or _rereadable(weights)):
+            recount = lambda edges: exact_bin_counts(weighted_batches(f, weights), edges, data.stats.max, True)
+    else:
+        data = StreamingHistogram()
+        if binary:
+            batches = read_binary_batches(f, binary, profile=profile)
+        elif cached:
+            batches = profile.blocks(cached_batches(f, cache_dir))
+        else:
+            batches = read_number_batches(f, profile=profile)
+        for batch in batches:
+            with profile.phase("stats"):
+                data.update(batch)
+                if sketch is not None:
+                    sketch.update(batch)
+            profile.values += len(batch)
+        again = None
+        if binary:
+            if isinstance(f, str):
+                again = lambda: read_binary_batches(f, binary)
+        elif cached:
+            again = lambda: cached_batches(f, cache_dir)
+        elif _rereadable(f):
+            again = lambda: read_number_batches(f)
+        if again is not None:
+            recount = lambda edges: exact_bin_counts(again(), edges, data.stats.max)
+    with profile.phase("bin"):
+        quantiles = sketch.percentiles(percentiles) if sketch is not None else None
+        return HistogramResult.from_histogram(data, bincount, binwidth, quantiles, recount)
@@ -69,7 +69,7 @@ def abbreviate(labels, rfill=' '):
     Abbreviate labels without introducing ambiguities.
     """
     max_len = max(len(l) for l in labels)
-    for i in range(1, max_len):
+    for i in range(1, max_len + 1):
         abbrev = [l[:i].ljust(i, rfill) for l in labels]
         if len(abbrev) == len(set(abbrev)):
             break
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Parallel ingestion of large histogram inputs
+"""
+
+import multiprocessing
+
+from .readers import read_number_batches, split_file
+from .sketch import QuantileSketch
+from .stats import StreamingHistogram, exact_bin_counts
+
+
+def _read_part(args):
+    """
+    Parse one byte range of a file into a StreamingHistogram (and sketch)
+    """
+    path, byte_range, with_sketch = args
+    data = StreamingHistogram()
+    sketch = QuantileSketch() if with_sketch else None
+    for batch in read_number_batches(path, byte_range=byte_range):
+        data.update(batch)
+        if sketch is not None:
+            sketch.update(batch)
+    return data, sketch
+
+
+def _count_part(args):
+    """
+    Count the numbers in one byte range of a file into fixed bins
+    """
+    path, byte_range, bins, max_val = args
+    return exact_bin_counts(read_number_batches(path, byte_range=byte_range), bins, max_val)
+
+
+def _map_parts(func, parts, workers):
+    """
+    Apply func to every part, in a pool of worker processes when there is
+    more than one part
+    """
+    if len(parts) < 2:
+        return [func(part) for part in parts]
+    pool = multiprocessing.Pool(min(workers, len(parts)))
+    try:
+        return pool.map(func, parts)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def parallel_read(path, workers, with_sketch=False):
+    """
+    Read a file with `workers` processes, each parsing a newline aligned part
+    of it, and merge their histograms. The pooled cells of a
+    StreamingHistogram are anchored at 0 with power of two widths, so the
+    partial results line up without agreeing on a range beforehand. Once
+    pooled the merged counts are approximate; the file is then counted
+    again into the final bins with `parallel_bin_counts`.
+
+    Returns the merged StreamingHistogram and QuantileSketch (or None).
+    """
+    parts = [(path, byte_range, with_sketch) for byte_range in split_file(path, workers)]
+    data = StreamingHistogram()
+    sketch = QuantileSketch() if with_sketch else None
+    for part_data, part_sketch in _map_parts(_read_part, parts, workers):
+        data.merge(part_data)
+        if sketch is not None:
+            sketch.merge(part_sketch)
+    return data, sketch
+
+
+def parallel_bin_counts(path, workers, bins, max_val=None):
+    """
+    Count the numbers of a file into fixed bins with `workers` processes,
+    each counting a newline aligned part of it exactly, and add up their
+    counts. The bins come from a first pass, see `parallel_read`.
+    """
+    parts = [(path, byte_range, bins, max_val) for byte_range in split_file(path, workers)]
+    hist = [0] * len(bins)
+    for counts in _map_parts(_count_part, parts, workers):
+        for i, count in enumerate(counts):
+            hist[i] += count
+    return hist
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Timing of the phases of a plot for bashplotlib
+"""
+
+from __future__ import division
+
+import sys
+import json
+import time
+from contextlib import contextmanager
+
+# phases of a plot, in the order they run
+PHASES = ("read", "parse", "stats", "bin", "render", "write")
+
+PROFILE_FORMATS = ("human", "json")
+
+
+class Profile(object):
+    """
+    Seconds spent in each phase of a plot, and the number of values and
+    bytes of input processed. Reading and parsing alternate block by block,
+    so both are the sum over all blocks.
+    """
+
+    def __init__(self):
+        self.seconds = dict((phase, 0.0) for phase in PHASES)
+        self.values = 0
+        self.bytes = 0
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Add the time spent in the block to a phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def timed(self, items, name):
+        """
+        Yield the items of an iterator, adding the time taken to produce
+        each one to a phase
+        """
+        items = iter(items)
+        while True:
+            start = time.perf_counter()
+            item = next(items, None)
+            self.seconds[name] += time.perf_counter() - start
+            if item is None:
+                return
+            yield item
+
+    def blocks(self, blocks, name="read"):
+        """
+        Yield blocks of input, timing how long each takes to read and
+        counting their bytes
+        """
+        for block in self.timed(blocks, name):
+            self.bytes += len(block) * getattr(block, "itemsize", 1)
+            yield block
+
+    def lines(self, lines):
+        """
+        Yield lines of input, counting their bytes
+        """
+        for line in lines:
+            self.bytes += len(line)
+            yield line
+
+    @property
+    def total(self):
+        return sum(self.seconds.values())
+
+    def to_dict(self):
+        return {
+            "seconds": dict(self.seconds),
+            "total": self.total,
+            "values": self.values,
+            "bytes": self.bytes,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    def report(self):
+        """
+        Table of the phases for people
+        """
+        total = self.total
+        lines = ["%-8s %10s %7s" % ("phase", "seconds", "share")]
+        for phase in PHASES:
+            share = self.seconds[phase] / total * 100 if total else 0.0
+            lines.append("%-8s %10.4f %6.1f%%" % (phase, self.seconds[phase], share))
+        lines.append("%-8s %10.4f" % ("total", total))
+        summary = "%d values, %.1f MB" % (self.values, self.bytes / 1e6)
+        if total:
+            summary += " (%.1f MB/s, %.0f values/s)" % (self.bytes / 1e6 / total, self.values / total)
+        lines.append(summary)
+        return "\n".join(lines) + "\n"
+
+    def write(self, stream=None, fmt="human"):
+        """
+        Write the report, or the JSON for fmt="json", to stderr
+        """
+        if stream is None:
+            stream = sys.stderr
+        stream.write(self.to_json() + "\n" if fmt == "json" else self.report())
+        stream.flush()
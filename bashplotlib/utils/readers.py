@@ -0,0 +1,434 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Bulk numeric readers for bashplotlib
+"""
+
+import os
+import sys
+import csv
+import mmap
+from array import array
+from itertools import islice
+
+# bytes handed to the parser at a time
+CHUNK_SIZE = 1 << 20
+# values per batch when reading from an iterable
+BATCH_SIZE = 1 << 16
+# array typecodes of the little-endian binary input formats
+BINARY_FORMATS = {"f4": "f", "f8": "d"}
+
+binary_help = ', '.join(sorted(BINARY_FORMATS))
+
+
+def _parse_block(block):
+    """
+    Parse a block of whitespace separated numbers into an array of doubles
+    """
+    return array('d', map(float, block.split()))
+
+
+def _parse_weighted_block(block):
+    """
+    Parse a block of lines with a value and its count, separated by a comma
+    or whitespace, into arrays of the values and the counts
+    """
+    if isinstance(block, bytes):
+        comma, space, newline, mark = b",", b" ", b"\n", b";"
+    else:
+        comma, space, newline, mark = ",", " ", "\n", ";"
+    # every line ends with a mark, so lines of exactly two numbers are
+    # recognised by slicing the tokens instead of looping over the lines
+    tokens = block.replace(comma, space).replace(newline, space + mark + space).split()
+    marks = tokens[2::3]
+    if len(tokens) % 3 != 1 and marks.count(mark) == len(marks) == tokens.count(mark):
+        return array('d', map(float, tokens[0::3])), array('d', map(float, tokens[1::3]))
+    # blank lines, or a line that does not hold a value and a count
+    values, counts = array('d'), array('d')
+    for line in block.splitlines():
+        fields = line.replace(comma, space).split()
+        if not fields:
+            continue
+        if len(fields) != 2:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8", "replace")
+            raise ValueError("expected a value and a count on every line, got %r" % line.strip())
+        values.append(float(fields[0]))
+        counts.append(float(fields[1]))
+    return values, counts
+
+
+def _parse_blocks(blocks, profile=None, parse=_parse_block):
+    """
+    Parse blocks of numbers, timing the reading and parsing of each block
+    when profiling
+    """
+    if profile is None:
+        for block in blocks:
+            yield parse(block)
+        return
+    for block in profile.blocks(blocks):
+        with profile.phase("parse"):
+            batch = parse(block)
+        yield batch
+
+
+def _iterable_batches(source):
+    """
+    Convert an iterable of lines or numbers into array('d') batches
+    """
+    numbers = iter(source)
+    while True:
+        batch = array('d', (float(str(number).strip()) for number in islice(numbers, BATCH_SIZE)))
+        if not batch:
+            break
+        yield batch
+
+
+def _mmap_blocks(mm, chunk_size, start=0, size=None):
+    """
+    Split a memory map (or the part of it from start to size) into newline
+    aligned blocks of about chunk_size bytes
+    """
+    if size is None:
+        size = len(mm)
+    while start < size:
+        end = start + chunk_size
+        if end < size:
+            newline = mm.rfind(b"\n", start, end)
+            if newline == -1:
+                # a single line longer than the chunk
+                newline = mm.find(b"\n", end, size)
+            end = size if newline == -1 else newline + 1
+        else:
+            end = size
+        yield mm[start:end]
+        start = end
+
+
+def _source_blocks(source, chunk_size, byte_range=None):
+    """
+    Newline aligned blocks of a file name (memory mapped) or file object
+    """
+    if not isinstance(source, str):
+        # read the bytes underneath text streams such as sys.stdin
+        for block in _stream_blocks(getattr(source, 'buffer', source), chunk_size):
+            yield block
+        return
+    with open(source, 'rb') as fh:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            return
+        try:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            start, end = byte_range or (0, len(mm))
+            for block in _mmap_blocks(mm, chunk_size, start, end):
+                yield block
+        finally:
+            mm.close()
+
+
+def _stream_blocks(fh, chunk_size):
+    """
+    Read a file object in chunks, carrying partial lines over to the next
+    block
+    """
+    rest = None
+    while True:
+        chunk = fh.read(chunk_size)
+        if not chunk:
+            break
+        if rest:
+            chunk = rest + chunk
+        newline = chunk.rfind(b"\n" if isinstance(chunk, bytes) else "\n")
+        if newline == -1:
+            rest = chunk
+            continue
+        rest = chunk[newline + 1:]
+        yield chunk[:newline + 1]
+    if rest:
+        yield rest
+
+
+def split_file(path, parts):
+    """
+    Split a file into at most `parts` (start, end) byte ranges that begin
+    and end on line boundaries
+    """
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, 'rb') as fh:
+        for i in range(1, parts):
+            position = max(size * i // parts, offsets[-1])
+            fh.seek(position)
+            if position > 0:
+                fh.readline()
+            offsets.append(min(fh.tell(), size))
+    offsets.append(size)
+    return [(start, end) for start, end in zip(offsets, offsets[1:]) if end > start]
+
+
+def read_number_batches(source, chunk_size=CHUNK_SIZE, byte_range=None, profile=None):
+    """
+    Yield the numbers in source as array('d') batches
+
+    Arguments:
+        source -- a file name (memory mapped), a file object (read in
+                  chunks, e.g. stdin) or an iterable of lines or numbers
+        chunk_size -- number of bytes parsed at a time
+        byte_range -- (start, end) part of a file name to read, see
+                      `split_file`
+        profile -- a `profiling.Profile` to add the read and parse times to
+    """
+    if isinstance(source, str) or hasattr(source, 'read'):
+        for batch in _parse_blocks(_source_blocks(source, chunk_size, byte_range), profile):
+            yield batch
+    else:
+        batches = _iterable_batches(source)
+        if profile is not None:
+            batches = profile.timed(batches, "parse")
+        for batch in batches:
+            yield batch
+
+
+def read_weighted_batches(source, chunk_size=CHUNK_SIZE, profile=None):
+    """
+    Yield (values, counts) array('d') batches of pre-aggregated input with
+    a value and the number of times it occurred on every line, e.g. "0.5,12"
+
+    Arguments:
+        source -- a file name (memory mapped), a file object (read in
+                  chunks, e.g. stdin) or an iterable of lines or
+                  (value, count) pairs
+        chunk_size -- number of bytes parsed at a time
+        profile -- a `profiling.Profile` to add the read and parse times to
+    """
+    if isinstance(source, str) or hasattr(source, 'read'):
+        for batch in _parse_blocks(_source_blocks(source, chunk_size), profile, _parse_weighted_block):
+            yield batch
+        return
+    pairs = iter(source)
+    while True:
+        values, counts = array('d'), array('d')
+        for pair in islice(pairs, BATCH_SIZE):
+            if isinstance(pair, str):
+                pair = pair.replace(",", " ").split()
+            if len(pair) != 2:
+                raise ValueError("expected a value and a count on every line, got %r" % (pair,))
+            value, count = pair
+            values.append(float(value))
+            counts.append(float(count))
+        if not values:
+            break
+        yield values, counts
+
+
+def _binary_batch(view, code):
+    """
+    View little-endian bytes as values, converting them on big-endian hosts
+    """
+    if sys.byteorder == "little":
+        return view.cast(code)
+    batch = array(code)
+    batch.frombytes(view)
+    batch.byteswap()
+    return batch
+
+
+def _mmap_binary(path, code, chunk_size, record):
+    """
+    Yield views of the values in a memory mapped binary file
+    """
+    with open(path, 'rb') as fh:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            return
+        try:
+            if len(mm) % record:
+                raise ValueError("%s does not hold a whole number of %d byte records" % (path, record))
+            with memoryview(mm) as view:
+                for start in range(0, len(mm), chunk_size):
+                    with view[start:start + chunk_size] as chunk:
+                        batch = _binary_batch(chunk, code)
+                        try:
+                            yield batch
+                        finally:
+                            if isinstance(batch, memoryview):
+                                batch.release()
+        finally:
+            mm.close()
+
+
+def _stream_binary(fh, code, chunk_size, record):
+    """
+    Yield views of the values in a binary stream, read into a reused buffer,
+    never splitting a record of record bytes
+    """
+    buf = bytearray(chunk_size)
+    with memoryview(buf) as view:
+        filled = 0
+        eof = False
+        while not eof:
+            # pipes return what is available, fill the whole buffer
+            while filled < chunk_size:
+                n = fh.readinto(view[filled:])
+                if not n:
+                    eof = True
+                    break
+                filled += n
+            usable = filled - filled % record
+            if usable:
+                with view[:usable] as chunk:
+                    batch = _binary_batch(chunk, code)
+                    try:
+                        yield batch
+                    finally:
+                        if isinstance(batch, memoryview):
+                            batch.release()
+            # a record split between reads is moved to the front
+            buf[:filled - usable] = buf[usable:filled]
+            filled -= usable
+    if filled:
+        raise ValueError("the input ends with a partial %d byte record" % record)
+
+
+def read_binary_batches(source, fmt="f8", chunk_size=CHUNK_SIZE, profile=None, group=1):
+    """
+    Yield the values of little-endian float32 ("f4") or float64 ("f8")
+    binary input in batches, without parsing. Batches of a file name are
+    views of its memory map and batches of a stream are views of the read
+    buffer, so each batch is only valid until the next one is requested.
+
+    Arguments:
+        source -- a file name (memory mapped) or binary file object (read
+                  in chunks, e.g. stdin)
+        fmt -- "f4" or "f8"
+        chunk_size -- number of bytes in a batch
+        profile -- a `profiling.Profile` to add the read time and bytes to
+        group -- number of values that are never split between batches,
+                 e.g. 2 for interleaved x,y pairs
+    """
+    if fmt not in BINARY_FORMATS:
+        raise ValueError("unknown binary format %r, expected one of: %s" % (fmt, binary_help))
+    code = BINARY_FORMATS[fmt]
+    record = array(code).itemsize * group
+    chunk_size = max(chunk_size - chunk_size % record, record)
+    if isinstance(source, str):
+        batches = _mmap_binary(source, code, chunk_size, record)
+    else:
+        # read the bytes underneath text streams such as sys.stdin
+        batches = _stream_binary(getattr(source, 'buffer', source), code, chunk_size, record)
+    if profile is not None:
+        batches = profile.blocks(batches)
+    for batch in batches:
+        yield batch
+
+
+def _column_index(spec, header):
+    """
+    Position of a column given by index (0 based) or header name
+    """
+    if isinstance(spec, int):
+        return spec
+    if spec.isdigit():
+        return int(spec)
+    if header is None or spec not in header:
+        raise ValueError("no column named %r" % spec)
+    return header.index(spec)
+
+
+def _append_rows(rows, appends):
+    """
+    Convert the selected fields of rows with the (index, append, is_text)
+    appends, skipping blank rows
+    """
+    for row in rows:
+        if not row:
+            continue
+        for index, append, is_text in appends:
+            field = row[index]
+            append(field.strip() if is_text else float(field))
+
+
+def iter_columns(source, columns, delimiter=",", text=(), batch_size=None):
+    """
+    Stream the selected columns of a delimited file in batches of at most
+    batch_size rows, each batch a list with an array('d') (or a list of
+    strings) per column. Without a batch_size all rows are one batch.
+    See `read_columns` for the arguments.
+    """
+    if isinstance(source, str):
+        with open(source, newline="") as fh:
+            for batch in iter_columns(fh, columns, delimiter, text, batch_size):
+                yield batch
+        return
+
+    def new_batch():
+        outputs = [[] if i in text else array('d') for i in range(len(columns))]
+        appends = [(index, out.append, i in text) for i, (index, out) in enumerate(zip(indices, outputs))]
+        return outputs, appends
+
+    rows = csv.reader(source, delimiter=delimiter)
+    first = next(rows, None)
+    while first is not None and not first:
+        first = next(rows, None)
+    if first is None:
+        if batch_size is None:
+            yield [[] if i in text else array('d') for i in range(len(columns))]
+        return
+    named = any(not isinstance(spec, int) and not spec.isdigit() for spec in columns)
+    header = [field.strip() for field in first] if named else None
+    indices = [_column_index(spec, header) for spec in columns]
+    outputs, appends = new_batch()
+
+    if header is None:
+        try:
+            values = [first[index].strip() if is_text else float(first[index])
+                      for index, _, is_text in appends]
+        except ValueError:
+            # a header row, selected by index
+            values = []
+        for (_, append, _), value in zip(appends, values):
+            append(value)
+
+    if batch_size is None:
+        _append_rows(rows, appends)
+        yield outputs
+        return
+    # without blank rows every row adds a value, so a short batch is the last
+    rows = filter(None, rows)
+    while True:
+        _append_rows(islice(rows, batch_size - len(outputs[0])), appends)
+        if len(outputs[0]) < batch_size:
+            if len(outputs[0]):
+                yield outputs
+            return
+        yield outputs
+        outputs, appends = new_batch()
+
+
+def read_columns(source, columns, delimiter=",", text=()):
+    """
+    Stream the selected columns of a delimited file into array('d') buffers
+
+    Rows are parsed with the csv module, so quoted fields may contain the
+    delimiter, and only the selected fields are converted. When a column
+    is given by name, or the first row is not numeric, the first row is
+    read as a header. Blank rows are skipped.
+
+    Arguments:
+        source -- a file name, file object or iterable of lines
+        columns -- list of column indices (0 based) or header names
+        delimiter -- field separator
+        text -- positions in columns to keep as lists of strings instead
+    """
+    if isinstance(source, str):
+        with open(source, newline="") as fh:
+            return read_columns(fh, columns, delimiter, text)
+    return next(iter_columns(source, columns, delimiter, text))
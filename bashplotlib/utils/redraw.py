@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+In-place redrawing of repeated plots, only sending what changed
+"""
+
+import re
+import sys
+
+from .helpers import bcolours
+
+# colour escape sequences, everything else is a character cell
+ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+
+# sequences back to the default colour
+RESETS = ("\033[0m", "\033[m", bcolours["ENDC"])
+
+# cursor moves cost a few bytes, so unchanged cells closer together than
+# this are rewritten instead of being jumped over
+MIN_GAP = 4
+
+
+def parse_frame(frame):
+    """
+    Split a frame into lines of (character, colour) cells, where the colour
+    is the escape sequence in effect for the character
+    """
+    lines = []
+    style = ""
+    for text in frame.split("\n"):
+        cells = []
+        pos = 0
+        for match in ESCAPE.finditer(text):
+            cells.extend((ch, style) for ch in text[pos:match.start()])
+            code = match.group()
+            style = "" if code in RESETS else code
+            pos = match.end()
+        cells.extend((ch, style) for ch in text[pos:])
+        lines.append(cells)
+    if frame.endswith("\n"):
+        lines.pop()
+    return lines
+
+
+def changed_spans(old, new):
+    """
+    (start, end) column ranges of a line that differ between two frames,
+    ending at the end of the new line
+    """
+    spans = []
+    for col in range(len(new)):
+        if col < len(old) and old[col] == new[col]:
+            continue
+        if spans and col - spans[-1][1] < MIN_GAP:
+            spans[-1][1] = col + 1
+        else:
+            spans.append([col, col + 1])
+    return spans
+
+
+class Redrawer(object):
+    """
+    Draws successive frames over each other. The previous frame is kept and
+    only the cells that changed are written, each changed span preceded by
+    a cursor move, so a refresh costs about as many bytes as cells changed
+    and the unchanged parts of the screen never flicker.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.lines = []
+
+    def diff(self, frame):
+        """
+        Escape sequences turning the previous frame into this one, leaving
+        the cursor at the start of the line below the frame
+        """
+        new = parse_frame(frame)
+        old = self.lines
+        out = []
+        # the cursor rests below the previous frame
+        cursor = [len(old), 0]
+
+        def move(row, col):
+            if [row, col] == cursor:
+                return
+            if row < cursor[0]:
+                out.append("\033[%dA" % (cursor[0] - row))
+            elif row > cursor[0]:
+                out.append("\033[%dB" % (row - cursor[0]))
+            out.append("\r")
+            if col:
+                out.append("\033[%dC" % col)
+            cursor[:] = [row, col]
+
+        def emit(cells):
+            style = ""
+            for ch, cell_style in cells:
+                if cell_style != style:
+                    if style:
+                        out.append(bcolours["ENDC"])
+                    out.append(cell_style)
+                    style = cell_style
+                out.append(ch)
+            if style:
+                out.append(bcolours["ENDC"])
+            cursor[1] += len(cells)
+
+        for row in range(min(len(old), len(new))):
+            for start, end in changed_spans(old[row], new[row]):
+                move(row, start)
+                emit(new[row][start:end])
+            if len(new[row]) < len(old[row]):
+                move(row, len(new[row]))
+                out.append("\033[K")
+
+        if len(new) < len(old):
+            # erase the lines below a frame that got shorter
+            move(len(new), 0)
+            out.append("\033[J")
+        else:
+            move(len(old), 0)
+            for cells in new[len(old):]:
+                emit(cells)
+                out.append("\n")
+        cursor[:] = [len(new), 0]
+        self.lines = new
+        return "".join(out)
+
+    def draw(self, frame):
+        """
+        Redraw the previous frame as frame
+        """
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(self.diff(frame))
+        stream.flush()
+
+    def reset(self):
+        """
+        Forget the previous frame, the next one is written out in full below
+        whatever is on the screen
+        """
+        self.lines = []
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Bounded memory quantile estimation for bashplotlib
+"""
+
+from __future__ import division
+
+import math
+
+
+def parse_percentiles(text):
+    """
+    Turn "50,99,99.9" into [50.0, 99.0, 99.9]
+    """
+    percentiles = [float(p) for p in text.split(",") if p.strip()]
+    for p in percentiles:
+        if not 0 <= p <= 100:
+            raise ValueError("percentiles must be between 0 and 100, got %g" % p)
+    return percentiles
+
+
+class QuantileSketch(object):
+    """
+    Mergeable quantile sketch with logarithmic buckets (DDSketch)
+
+    A value x > 0 is counted in bucket ceil(log(x, gamma)) with
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy); negative values
+    use a second set of buckets for -x and zeros are counted separately.
+    Every quantile estimate is then within `relative_accuracy` (1% by
+    default) of the exact value of that rank. Each sign keeps at most
+    `max_buckets` buckets; beyond that the buckets nearest to zero are merged,
+    which only affects the accuracy of the lowest magnitudes, i.e. when the
+    values span more than a factor of gamma ** max_buckets (about 1e17 with
+    the defaults).
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.n = 0
+        self.min = None
+        self.max = None
+
+    def key(self, x):
+        """
+        Bucket of a positive value
+        """
+        return int(math.ceil(math.log(x) / self.log_gamma))
+
+    def value(self, key):
+        """
+        Representative value of a bucket
+        """
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def update(self, values, weights=None):
+        """
+        Add an iterable of numbers, with an optional count for each of them
+        """
+        if weights is not None:
+            for x, w in zip(values, weights):
+                if w > 0:
+                    self._add(x, w)
+            self._compact()
+            return
+        positive, negative = self.positive, self.negative
+        log, ceil, log_gamma = math.log, math.ceil, self.log_gamma
+        n, lo, hi = self.n, self.min, self.max
+        for x in values:
+            if n == 0:
+                lo = hi = x
+            elif x < lo:
+                lo = x
+            elif x > hi:
+                hi = x
+            n += 1
+            if x > 0:
+                key = int(ceil(log(x) / log_gamma))
+                positive[key] = positive.get(key, 0) + 1
+            elif x < 0:
+                key = int(ceil(log(-x) / log_gamma))
+                negative[key] = negative.get(key, 0) + 1
+            else:
+                self.zeros += 1
+        self.n, self.min, self.max = n, lo, hi
+        self._compact()
+
+    def _add(self, x, count):
+        """
+        Add count occurrences of a single number
+        """
+        if self.n == 0:
+            self.min = self.max = x
+        else:
+            self.min, self.max = min(self.min, x), max(self.max, x)
+        self.n += count
+        if x > 0:
+            key = self.key(x)
+            self.positive[key] = self.positive.get(key, 0) + count
+        elif x < 0:
+            key = self.key(-x)
+            self.negative[key] = self.negative.get(key, 0) + count
+        else:
+            self.zeros += count
+
+    def add_counts(self, positive, negative, zeros, n, min_val, max_val):
+        """
+        Add pre-computed bucket counts, e.g. from the numpy backend
+        """
+        for store, counts in ((self.positive, positive), (self.negative, negative)):
+            for key, count in counts.items():
+                store[key] = store.get(key, 0) + count
+        self.zeros += zeros
+        if n:
+            self.min = min_val if self.min is None else min(self.min, min_val)
+            self.max = max_val if self.max is None else max(self.max, max_val)
+            self.n += n
+        self._compact()
+
+    def merge(self, other):
+        """
+        Add the counts of another sketch with the same accuracy
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        self.add_counts(other.positive, other.negative, other.zeros, other.n, other.min, other.max)
+
+    def _compact(self):
+        """
+        Merge the buckets nearest to zero until each sign fits in max_buckets
+        """
+        for store in (self.positive, self.negative):
+            if len(store) > self.max_buckets:
+                keys = sorted(store)
+                excess = keys[:len(keys) - self.max_buckets + 1]
+                store[excess[-1]] += sum(store.pop(key) for key in excess[:-1])
+
+    def to_dict(self):
+        """
+        Plain dict representation, see `from_dict`
+        """
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_buckets": self.max_buckets,
+            "positive": [[key, count] for key, count in sorted(self.positive.items())],
+            "negative": [[key, count] for key, count in sorted(self.negative.items())],
+            "zeros": self.zeros, "n": self.n, "min": self.min, "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        """
+        Rebuild a sketch from `to_dict` output
+        """
+        sketch = cls(d["relative_accuracy"], d["max_buckets"])
+        sketch.positive = dict((key, count) for key, count in d["positive"])
+        sketch.negative = dict((key, count) for key, count in d["negative"])
+        sketch.zeros, sketch.n, sketch.min, sketch.max = d["zeros"], d["n"], d["min"], d["max"]
+        return sketch
+
+    def quantile(self, q):
+        """
+        Estimate the value at quantile q (between 0 and 1)
+        """
+        if self.n == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.n - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self.value(key), self.min)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self.value(key), self.max)
+        return self.max
+
+    def percentiles(self, percentiles):
+        """
+        Return a dict of percentile -> estimate
+        """
+        return dict((p, self.quantile(p / 100)) for p in percentiles)
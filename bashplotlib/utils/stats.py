@@ -0,0 +1,598 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Streaming statistics and binning for bashplotlib
+"""
+
+from __future__ import division
+
+import json
+import math
+import random
+from array import array
+from bisect import bisect_left
+
+
+class RunningStats(object):
+    """
+    Count, min, max, mean and standard deviation accumulated in one pass
+    using Welford's online algorithm
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, x, weight=1):
+        """
+        Add a single value, or weight occurrences of it (West's weighted
+        update, so the variance treats weights as repeat counts)
+        """
+        if weight <= 0:
+            return
+        self.n += weight
+        delta = x - self.mean
+        self.mean += delta * weight / self.n
+        self.m2 += weight * delta * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    def merge(self, other):
+        """
+        Combine with the statistics of another set of values (Chan et al.)
+        """
+        if not other.n:
+            return
+        if not self.n:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def decay(self, factor):
+        """
+        Scale down the weight of the values seen so far, so that recent values
+        dominate the mean and variance. min and max still cover all values
+        """
+        self.n *= factor
+        self.m2 *= factor
+
+    @property
+    def variance(self):
+        """
+        Sample variance, 0 for fewer than two values
+        """
+        if self.n <= 1:
+            return 0.0
+        return self.m2 / (self.n - 1)
+
+    @property
+    def sd(self):
+        """
+        Sample standard deviation
+        """
+        return self.variance ** 0.5
+
+
+class BinLookup(object):
+    """
+    Find the histogram bin of a value without scanning the bins
+
+    A value belongs to the first bin whose edge it does not exceed, values
+    beyond the last edge belong to no bin except the maximum value, which
+    goes to the last bin. The index is computed arithmetically from the bin
+    width when the edges are evenly spaced (as produced by `calc_bins`) and
+    checked against the neighbouring edges; irregular edges fall back to a
+    binary search.
+    """
+
+    def __init__(self, bins, max_val=None):
+        self.bins = list(bins)
+        self.max_val = max_val
+        self.start = self.bins[0]
+        self.step = None
+        nbins = len(self.bins)
+        if nbins > 1:
+            step = (self.bins[-1] - self.start) / (nbins - 1)
+            tolerance = abs(step) * 1e-6
+            if step > 0 and all(abs(b - (self.start + i * step)) <= tolerance
+                                for i, b in enumerate(self.bins)):
+                self.step = step
+
+    def index(self, x):
+        """
+        Return the bin index of x, or None if it falls outside the bins
+        """
+        bins = self.bins
+        nbins = len(bins)
+        i = None
+        if self.step is not None:
+            i = int(math.ceil((x - self.start) / self.step))
+            if i < 0:
+                i = 0
+            elif i > nbins:
+                i = nbins
+            # the edges are rounded by drange, so the guess may be one off
+            if i < nbins and x > bins[i]:
+                i += 1
+            elif i > 0 and x <= bins[i - 1]:
+                i -= 1
+            if not ((i == nbins or x <= bins[i]) and (i == 0 or x > bins[i - 1])):
+                i = None
+        if i is None:
+            i = bisect_left(bins, x)
+        if i == nbins:
+            if x == self.max_val and self.max_val > bins[-1]:
+                return nbins - 1
+            return None
+        return i
+
+
+def exact_bin_counts(batches, bins, max_val=None, weighted=False):
+    """
+    Count the values of every batch into bins, following the edge rules of
+    `BinLookup`. Weighted batches are (values, counts) pairs.
+    """
+    index = BinLookup(bins, max_val).index
+    hist = [0] * len(bins)
+    for batch in batches:
+        if weighted:
+            for x, count in zip(*batch):
+                i = index(x)
+                if i is not None:
+                    hist[i] += count
+            continue
+        for x in batch:
+            i = index(x)
+            if i is not None:
+                hist[i] += 1
+    return hist
+
+
+class StreamingHistogram(object):
+    """
+    One pass histogram accumulator with O(max_bins) memory
+
+    Values are counted exactly until more than `max_bins` distinct values
+    have been seen. After that they are pooled into cells of a power of two
+    width anchored at 0, and the cell width doubles whenever the number of
+    cells would exceed `max_bins`. The output bins are only chosen once all
+    the data has been seen, see `bin_counts`.
+
+    Pooled counts are approximate: a cell is counted in the bin of its
+    midpoint, so values near a bin edge may land in the neighbouring bin.
+    Input that can be read again should be counted exactly in a second
+    pass once the bins are known (see `exact_bin_counts`); only unbounded
+    streams rely on the pooled counts.
+    """
+
+    def __init__(self, max_bins=16384):
+        self.stats = RunningStats()
+        self.max_bins = max_bins
+        self.counts = {}
+        # width of the pooled cells, None while values are counted exactly
+        self.width = None
+
+    def update(self, values, weights=None):
+        """
+        Add an iterable of numbers, with an optional count for each of them
+        """
+        if weights is not None:
+            self._update_weighted(values, weights)
+            return
+        stats, counts, max_bins = self.stats, self.counts, self.max_bins
+        n, mean, m2 = stats.n, stats.mean, stats.m2
+        lo, hi = stats.min, stats.max
+        width = self.width
+        for x in values:
+            if n == 0:
+                lo = hi = x
+            elif x < lo:
+                lo = x
+            elif x > hi:
+                hi = x
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+
+            key = x if width is None else math.floor(x / width)
+            counts[key] = counts.get(key, 0) + 1
+            if len(counts) > max_bins:
+                width = self._collapse(lo, hi)
+                counts = self.counts
+        stats.n, stats.mean, stats.m2 = n, mean, m2
+        stats.min, stats.max = lo, hi
+
+    def _update_weighted(self, values, weights):
+        """
+        Add numbers with the number of times each one occurred
+        """
+        stats, counts, max_bins = self.stats, self.counts, self.max_bins
+        width = self.width
+        for x, w in zip(values, weights):
+            if w < 0:
+                raise ValueError("counts cannot be negative, got %r for %r" % (w, x))
+            if not w:
+                continue
+            stats.update(x, w)
+            key = x if width is None else math.floor(x / width)
+            counts[key] = counts.get(key, 0) + w
+            if len(counts) > max_bins:
+                width = self._collapse(stats.min, stats.max)
+                counts = self.counts
+
+    def _collapse(self, lo, hi):
+        """
+        Pool the counts into cells coarse enough to fit in max_bins
+        """
+        width = self.width
+        if width is None:
+            # leave room for the range to double before the next collapse
+            width = 2.0 ** math.ceil(math.log((hi - lo) * 2 / self.max_bins, 2))
+            cells = {}
+            for value, count in self.counts.items():
+                key = math.floor(value / width)
+                cells[key] = cells.get(key, 0) + count
+            self.counts = cells
+        while len(self.counts) > self.max_bins:
+            width *= 2
+            cells = {}
+            for key, count in self.counts.items():
+                key //= 2
+                cells[key] = cells.get(key, 0) + count
+            self.counts = cells
+        self.width = width
+        return width
+
+    def merge(self, other):
+        """
+        Add the counts of another StreamingHistogram. Pooled cells always
+        have a power of two width anchored at 0, so cells of different
+        widths line up and the finer ones can be merged into the coarser.
+        """
+        self.stats.merge(other.stats)
+        width = self.width
+        if other.width is not None and (width is None or other.width > width):
+            width = other.width
+        counts = {}
+        for part in (self, other):
+            if width is None or part.width == width:
+                items = part.counts.items()
+            elif part.width is None:
+                items = ((math.floor(value / width), count) for value, count in part.counts.items())
+            else:
+                ratio = int(round(width / part.width))
+                items = ((key // ratio, count) for key, count in part.counts.items())
+            for key, count in items:
+                counts[key] = counts.get(key, 0) + count
+        self.counts = counts
+        self.width = width
+        if len(counts) > self.max_bins:
+            self._collapse(self.stats.min, self.stats.max)
+
+    @property
+    def exact(self):
+        """
+        Whether every distinct value is still counted on its own, so that
+        `bin_counts` is exact
+        """
+        return self.width is None
+
+    def decay(self, factor, min_count=1e-3):
+        """
+        Multiply all counts by factor, forgetting values whose count drops
+        below min_count
+        """
+        self.stats.decay(factor)
+        self.counts = dict((key, count * factor) for key, count in self.counts.items()
+                           if count * factor >= min_count)
+
+    def items(self):
+        """
+        Yield (value, count) pairs, pooled cells are represented by their
+        midpoint clipped to the observed range (see `exact`)
+        """
+        if self.width is None:
+            for value, count in self.counts.items():
+                yield value, count
+        else:
+            lo, hi, width = self.stats.min, self.stats.max, self.width
+            for key, count in self.counts.items():
+                yield min(max((key + 0.5) * width, lo), hi), count
+
+    def bin_counts(self, bins):
+        """
+        Count the values falling in each bin. A value belongs to the first
+        bin whose edge it does not exceed; the maximum value goes to the last
+        bin when it lies beyond the last edge. The counts are approximate
+        once the values have been pooled, see `exact`
+        """
+        lookup = BinLookup(bins, self.stats.max)
+        hist = [0] * len(bins)
+        for value, count in self.items():
+            i = lookup.index(value)
+            if i is not None:
+                hist[i] += count
+        return hist
+
+
+class HistogramState(object):
+    """
+    A histogram with fixed bin edges: the count in every bin plus the
+    summary moments of the values (and optionally a QuantileSketch of them).
+    States with the same edges can be merged, so shards can be counted on
+    different hosts, saved with pickle or `to_json` and rendered once.
+
+    Bins follow the usual edge rules (see `BinLookup`); values beyond the
+    last edge are counted in the last bin.
+    """
+
+    __slots__ = ("edges", "counts", "stats", "sketch")
+
+    def __init__(self, edges, counts=None, stats=None, sketch=None):
+        self.edges = array('d', edges)
+        if counts is None:
+            counts = [0] * len(self.edges)
+        if len(counts) != len(self.edges):
+            raise ValueError("expected %d counts, got %d" % (len(self.edges), len(counts)))
+        self.counts = array('d', counts)
+        self.stats = stats if stats is not None else RunningStats()
+        self.sketch = sketch
+
+    @classmethod
+    def from_histogram(cls, data, bins, sketch=None):
+        """
+        Bin a StreamingHistogram into the given edges
+        """
+        return cls(bins, data.bin_counts(bins), data.stats, sketch)
+
+    @property
+    def bins(self):
+        """
+        The bin edges, with whole numbers as ints
+        """
+        return [int(b) if b.is_integer() else b for b in self.edges]
+
+    def update(self, values):
+        """
+        Add an iterable of numbers
+        """
+        values = list(values)
+        lookup = BinLookup(self.edges)
+        counts, last = self.counts, len(self.counts) - 1
+        stats = self.stats
+        for x in values:
+            i = lookup.index(x)
+            counts[last if i is None else i] += 1
+            stats.update(x)
+        if self.sketch is not None:
+            self.sketch.update(values)
+
+    def merge(self, other):
+        """
+        Add the counts and moments of a state with the same edges
+        """
+        if self.edges != other.edges:
+            raise ValueError("cannot merge histograms with different bin edges")
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.stats.merge(other.stats)
+        if self.sketch is not None and other.sketch is not None:
+            self.sketch.merge(other.sketch)
+        else:
+            self.sketch = None
+
+    def to_dict(self):
+        """
+        Plain dict representation, see `from_dict`
+        """
+        stats = self.stats
+        return {
+            "edges": list(self.edges),
+            "counts": [int(c) if c.is_integer() else c for c in self.counts],
+            "n": stats.n, "mean": stats.mean, "m2": stats.m2, "min": stats.min, "max": stats.max,
+            "sketch": self.sketch.to_dict() if self.sketch is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        """
+        Rebuild a state from `to_dict` output
+        """
+        from .sketch import QuantileSketch
+
+        stats = RunningStats()
+        stats.n, stats.mean, stats.m2 = d["n"], d["mean"], d["m2"]
+        stats.min, stats.max = d["min"], d["max"]
+        sketch = QuantileSketch.from_dict(d["sketch"]) if d.get("sketch") else None
+        return cls(d["edges"], d["counts"], stats, sketch)
+
+    def to_json(self):
+        """
+        Serialize the state as a JSON string
+        """
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text):
+        """
+        Rebuild a state from `to_json` output
+        """
+        return cls.from_dict(json.loads(text))
+
+    def render(self, orientation="vertical", percentiles=None, **kwargs):
+        """
+        Return the plot as a string. orientation is "vertical" or
+        "horizontal", the keyword arguments are the plotting options of
+        `histogram.draw_vertical` or `horizontal_histogram.draw_horizontal`
+        """
+        from .compute import HistogramResult
+        from ..histogram import draw_vertical
+        from ..horizontal_histogram import draw_horizontal
+
+        renderers = {"vertical": draw_vertical, "horizontal": draw_horizontal}
+        if orientation not in renderers:
+            raise ValueError("unknown orientation %r, expected vertical or horizontal" % orientation)
+        result = HistogramResult.from_state(self, percentiles)
+        return renderers[orientation](result, **kwargs).render()
+
+
+class TimeBuckets(object):
+    """
+    Ring buffer with the count and sum of the values in the last `size`
+    buckets of `width` seconds. The window follows the newest timestamp
+    seen (or `advance`), older values are dropped, so memory stays fixed
+    however long the input is.
+    """
+
+    STATS = ("count", "sum", "mean")
+
+    def __init__(self, width, size):
+        if width <= 0 or size < 1:
+            raise ValueError("expected a positive bucket width and number of buckets")
+        self.width = float(width)
+        self.size = int(size)
+        self.counts = array('d', [0.0]) * self.size
+        self.sums = array('d', [0.0]) * self.size
+        # time // width of the newest bucket
+        self.newest = None
+
+    def advance(self, t):
+        """
+        Move the window forward so that it ends with the bucket of time t
+        """
+        index = int(math.floor(t / self.width))
+        if self.newest is None:
+            self.newest = index
+            return
+        if index <= self.newest:
+            return
+        # only the buckets that leave the window are cleared
+        for i in range(self.newest + 1, min(index, self.newest + self.size) + 1):
+            self.counts[i % self.size] = 0.0
+            self.sums[i % self.size] = 0.0
+        self.newest = index
+
+    def add(self, t, value=1.0):
+        """
+        Count a value at time t, returning False if it is older than the
+        window
+        """
+        index = int(math.floor(t / self.width))
+        self.advance(t)
+        if index <= self.newest - self.size:
+            return False
+        slot = index % self.size
+        self.counts[slot] += 1
+        self.sums[slot] += value
+        return True
+
+    def series(self, stat="count"):
+        """
+        List of (bucket start time, value) pairs, oldest first. stat is
+        "count", "sum" or "mean"; the mean of an empty bucket is None
+        """
+        if stat not in self.STATS:
+            raise ValueError("unknown statistic %r, expected one of: %s" % (stat, ", ".join(self.STATS)))
+        if self.newest is None:
+            return []
+        series = []
+        for index in range(self.newest - self.size + 1, self.newest + 1):
+            count, total = self.counts[index % self.size], self.sums[index % self.size]
+            if stat == "count":
+                value = count
+            elif stat == "sum":
+                value = total
+            else:
+                value = total / count if count else None
+            series.append((index * self.width, value))
+        return series
+
+
+class Reservoir(object):
+    """
+    Uniform random sample of at most `size` points from a stream of any
+    length, with the exact bounds of all the points seen. Uses Li's
+    Algorithm L, which draws the number of points to skip before the next
+    replacement instead of a random number for every point.
+    """
+
+    def __init__(self, size, seed=None):
+        if size < 1:
+            raise ValueError("the sample size must be at least 1")
+        self.size = size
+        self.xs = array('d')
+        self.ys = array('d')
+        self.colours = []
+        self.seen = 0
+        self.x_bounds = None
+        self.y_bounds = None
+        self._random = random.Random(seed)
+        self._w = 1.0
+        self._next = None
+
+    def _uniform(self):
+        """
+        Random number in the open interval (0, 1)
+        """
+        u = 0.0
+        while u == 0.0:
+            u = self._random.random()
+        return u
+
+    def _skip(self):
+        """
+        Advance the weight and draw the number of points to skip
+        """
+        self._w *= math.exp(math.log(self._uniform()) / self.size)
+        if self._w >= 1.0:
+            # rounded up for huge samples, take the next point
+            return 0
+        return int(math.log(self._uniform()) / math.log1p(-self._w))
+
+    def update(self, xs, ys, colours=None):
+        """
+        Add a batch of points, with an optional colour for each
+        """
+        n = len(xs)
+        if not n:
+            return
+        x_lo, x_hi, y_lo, y_hi = min(xs), max(xs), min(ys), max(ys)
+        if self.x_bounds is not None:
+            x_lo, x_hi = min(x_lo, self.x_bounds[0]), max(x_hi, self.x_bounds[1])
+            y_lo, y_hi = min(y_lo, self.y_bounds[0]), max(y_hi, self.y_bounds[1])
+        self.x_bounds, self.y_bounds = (x_lo, x_hi), (y_lo, y_hi)
+
+        i = 0
+        # the first size points fill the reservoir
+        while len(self.xs) < self.size and i < n:
+            self.xs.append(xs[i])
+            self.ys.append(ys[i])
+            if colours is not None:
+                self.colours.append(colours[i])
+            i += 1
+        if self._next is None and len(self.xs) == self.size:
+            self._next = self.size + self._skip()
+        # then only the points the skips land on are looked at
+        while self._next is not None and self._next - self.seen < n:
+            i = self._next - self.seen
+            slot = self._random.randrange(self.size)
+            self.xs[slot] = xs[i]
+            self.ys[slot] = ys[i]
+            if colours is not None:
+                self.colours[slot] = colours[i]
+            self._next += 1 + self._skip()
+        self.seen += n
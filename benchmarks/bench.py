@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks for bashplotlib histograms and scatterplots
+
+Generates synthetic inputs, runs every plot and records the time of its
+read, parse, stats, bin, render and write phases, as reported through its
+on_profile hook, and the peak memory of a full run. Results
+are written as JSON; pass a previous result file with --compare to list
+the timings that got slower.
+
+    python benchmarks/bench.py --sizes 1e3,1e5 -o before.json
+    python benchmarks/bench.py --sizes 1e3,1e5 --compare before.json
+"""
+
+from __future__ import print_function
+from __future__ import division
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import optparse
+import platform
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bashplotlib import histogram, horizontal_histogram, scatterplot
+from bashplotlib.utils.backends import np
+
+
+DISTRIBUTIONS = {
+    "uniform": lambda rnd: rnd.uniform(0, 1000),
+    "exponential": lambda rnd: rnd.expovariate(0.01),
+    "heavy_tailed": lambda rnd: rnd.paretovariate(1.2),
+    "duplicates": lambda rnd: float(rnd.randint(0, 99)),
+}
+
+
+def generate(path, distribution, size, columns=1, seed=0):
+    """
+    Write size rows of random values to path
+    """
+    rnd = random.Random(seed)
+    draw = DISTRIBUTIONS[distribution]
+    with open(path, "w") as fh:
+        for _ in range(size):
+            fh.write(",".join("%.6g" % draw(rnd) for _ in range(columns)) + "\n")
+
+
+def timed(fn, *args, **kwargs):
+    """
+    Return the result of fn and the seconds it took
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def peak_memory(fn, *args, **kwargs):
+    """
+    Peak bytes allocated through Python while running fn
+    """
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def quiet(fn, *args, **kwargs):
+    """
+    Run fn with stdout discarded
+    """
+    with redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def profiled(plot):
+    """
+    Run a plot with stdout discarded, returning the phase timings it reports
+    through on_profile and the seconds the whole run took
+    """
+    profiles = []
+    _, total = timed(quiet, plot, profiles.append)
+    return dict(profiles[-1].seconds), total
+
+
+def run(sizes, distributions, backends, workdir):
+    """
+    Run every benchmark and return the list of results
+    """
+    results = []
+    for size in sizes:
+        for distribution in distributions:
+            column = os.path.join(workdir, "%s-%d.txt" % (distribution, size))
+            pairs = os.path.join(workdir, "%s-%d.csv" % (distribution, size))
+            generate(column, distribution, size)
+            generate(pairs, distribution, size, columns=2)
+            for backend in backends:
+                # the phases are timed by the plots themselves
+                plots = [
+                    ("histogram", lambda on_profile=None: histogram.plot_hist(
+                        column, showSummary=True, backend=backend, on_profile=on_profile)),
+                    ("horizontal_histogram", lambda on_profile=None: horizontal_histogram.plot_hist(
+                        column, showSummary=True, backend=backend, on_profile=on_profile)),
+                    ("scatter", lambda on_profile=None: scatterplot.plot_scatter(
+                        pairs, None, None, 20, "x", "default", "", backend=backend, on_profile=on_profile)),
+                ]
+                for name, full_run in plots:
+                    phases, total = profiled(full_run)
+                    result = {
+                        "plot": name,
+                        "distribution": distribution,
+                        "size": size,
+                        "backend": backend,
+                        "phases": phases,
+                        "total": total,
+                        "peak_memory": peak_memory(quiet, full_run),
+                    }
+                    results.append(result)
+                    sys.stderr.write("%-20s %-12s %9d %-6s %8.3fs %10d bytes\n" % (
+                        name, distribution, size, backend, total, result["peak_memory"]))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the timings that are more than threshold times slower than in
+    baseline and return how many there are
+    """
+    def key(r):
+        return r["plot"], r["distribution"], r["size"], r["backend"]
+
+    previous = dict((key(r), r) for r in baseline["results"])
+    slower = 0
+    for r in results:
+        old = previous.get(key(r))
+        if old is None:
+            continue
+        timings = [("total", r["total"], old["total"])]
+        timings += [(phase, t, old["phases"].get(phase)) for phase, t in sorted(r["phases"].items())]
+        for phase, new_t, old_t in timings:
+            if old_t and new_t > old_t * threshold and new_t - old_t > 0.005:
+                slower += 1
+                print("slower: %s %s %d %s %s %.4fs -> %.4fs (x%.2f)" % (
+                    key(r) + (phase, old_t, new_t, new_t / old_t)))
+    return slower
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option('--sizes', help='comma separated input sizes (default 1e3,1e4,1e5,1e6)',
+                      default='1e3,1e4,1e5,1e6', dest='sizes')
+    parser.add_option('--distributions', help='comma separated distributions (%s)' % ', '.join(DISTRIBUTIONS),
+                      default=','.join(DISTRIBUTIONS), dest='distributions')
+    parser.add_option('--backends', help='comma separated backends (python, numpy)',
+                      default='python,numpy' if np is not None else 'python', dest='backends')
+    parser.add_option('-o', '--output', help='write the JSON results to this file instead of stdout',
+                      default=None, dest='output')
+    parser.add_option('--compare', help='JSON results of a previous run to compare against',
+                      default=None, dest='compare')
+    parser.add_option('--threshold', help='slowdown factor reported by --compare (default 1.2)',
+                      type='float', default=1.2, dest='threshold')
+    opts, args = parser.parse_args()
+
+    sizes = [int(float(s)) for s in opts.sizes.split(",")]
+    workdir = tempfile.mkdtemp(prefix="bashplotlib-bench-")
+    try:
+        results = run(sizes, opts.distributions.split(","), opts.backends.split(","), workdir)
+    finally:
+        shutil.rmtree(workdir)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__ if np is not None else None,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    if opts.output:
+        with open(opts.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if opts.compare:
+        with open(opts.compare) as fh:
+            baseline = json.load(fh)
+        if compare(results, baseline, opts.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,8 +17,12 @@ setup(
     long_description=long_description,
     entry_points = {
         'console_scripts': [
-            'hist=bashplotlib.histogram:main',
-            'scatter=bashplotlib.scatterplot:main',
+            'hist=bashplotlib.server:hist',
+            'hbar=bashplotlib.server:hbar',
+            'scatter=bashplotlib.server:scatter',
+            'timehist=bashplotlib.server:timehist',
+            'dashboard=bashplotlib.dashboard:main',
+            'bashplotlib=bashplotlib.server:main',
         ]
     },
     keywords=['plotting', 'console', 'shell'],
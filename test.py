@@ -1,5 +1,84 @@
+import io
+import os
+import pickle
+import re
+import shutil
+import socket
+import struct
+import sys
+import tempfile
+import threading
 import unittest
-from bashplotlib.scatterplot import _plot_scatter
+from contextlib import redirect_stderr, redirect_stdout
+import asyncio
+from bashplotlib.dashboard import HistPane, ScatterPane, layout, run_dashboard
+from bashplotlib.histogram import draw_vertical, follow_hist, main as hist_main, plot_hist, read_histogram
+from bashplotlib.horizontal_histogram import draw_horizontal, plot_hist as plot_hbar
+from bashplotlib.scatterplot import _plot_scatter, plot_scatter
+from bashplotlib.server import PlotServer, _PlotHandler, forward, serve
+from bashplotlib.timeseries import follow_timeseries, parse_duration, read_events, sparkline
+from bashplotlib.utils.backends import np, resolve_backend
+from bashplotlib.utils.braille import BrailleCanvas
+from bashplotlib.utils.cache import cached_batches, sidecar_path
+from bashplotlib.utils.canvas import Canvas
+from bashplotlib.utils.compute import compute_hist
+from bashplotlib.utils.helpers import bcolours, get_colour
+from bashplotlib.utils.parallel import parallel_bin_counts, parallel_read
+from bashplotlib.utils.profiling import PHASES
+from bashplotlib.utils.redraw import Redrawer
+from bashplotlib.utils.readers import (iter_columns, read_binary_batches, read_columns, read_number_batches,
+                                       split_file)
+from bashplotlib.utils.sketch import QuantileSketch, parse_percentiles
+from bashplotlib.utils.stats import (BinLookup, HistogramState, Reservoir, RunningStats, StreamingHistogram,
+                                     TimeBuckets, exact_bin_counts)
+
+
+def naive_bin_counts(values, bins):
+    """
+    Count values into bins by scanning the edges, the way hist always has
+    """
+    hist = [0] * len(bins)
+    top = max(values)
+    for x in values:
+        for i, edge in enumerate(bins):
+            if x <= edge:
+                hist[i] += 1
+                break
+        else:
+            if x == top:
+                hist[-1] += 1
+    return hist
+
+
+def screen(output):
+    """
+    Lines left on a terminal after writing output, without colours
+    """
+    lines, row, col = [[]], 0, 0
+    for token in re.findall(r"\x1b\[(\d*)([A-Za-z])|(\r)|(\n)|(.)", output, re.S):
+        count, command, cr, nl, ch = token
+        if command == "A":
+            row -= int(count or 1)
+        elif command == "B":
+            row += int(count or 1)
+        elif command == "C":
+            col += int(count or 1)
+        elif command == "K":
+            del lines[row][col:]
+        elif command == "J":
+            del lines[row][col:]
+            del lines[row + 1:]
+        elif cr:
+            col = 0
+        elif nl:
+            row, col = row + 1, 0
+        elif ch:
+            lines[row].extend(" " * (col - len(lines[row])))
+            lines[row][col:col + 1] = [ch]
+            col += 1
+        while len(lines) <= row:
+            lines.append([])
+    return ["".join(line) for line in lines]
 
 
 class graphTestCase(unittest.TestCase):
@@ -80,5 +159,582 @@ y: x axis
                result, "_plot_scatter fails-same_dot"
 
 
+    def testSample(self):
+        lines = ["%d,%d" % (i, i % 10) for i in range(1000)]
+        with redirect_stdout(io.StringIO()) as out:
+            plot_scatter(lines, None, None, 10, "x", "default", "", sample=20)
+            plot_scatter(lines, None, None, 10, "x", "default", "", sample=1000)
+            plot_scatter(lines, None, None, 10, "x", "default", "")
+        sampled, kept, full = out.getvalue().split("My x axis")[:3]
+        # a sample holding every point plots them all
+        assert kept == full and sampled != full
+
+    def testBinary(self):
+        points = [(i % 17, i % 10 - 4.5) for i in range(300)]
+        data = struct.pack("<600d", *[v for point in points for v in point])
+        with redirect_stdout(io.StringIO()) as text:
+            plot_scatter(["%r,%r" % point for point in points], None, None, 10, "x", "default", "")
+        with redirect_stdout(io.StringIO()) as binary:
+            plot_scatter(io.BytesIO(data), None, None, 10, "x", "default", "", backend="python", binary="f8")
+        assert text.getvalue() == binary.getvalue()
+
+    def testBraille(self):
+        canvas = BrailleCanvas(2, 1)
+        canvas.set(0, 0)
+        canvas.set(3, 3)
+        assert canvas.cells == bytearray([0x01, 0x80]) and list(canvas.rows()) == [u"\u2801\u2880"]
+        # the corners of the bounds land on the corner dots
+        canvas = BrailleCanvas(2, 2)
+        canvas.plot([0, 10, 5], [0, 10, 20], (0, 10), (0, 10))
+        assert list(canvas.rows()) == [u" \u2808", u"\u2840 "]
+        graph = _plot_scatter([0, 1, 2], [2, 1, 0], 3, "x", "", "x", "y", "center", False, "python", braille=True)
+        assert graph.split("\n")[2:5] == [u"| \u2801      |", u"|    \u2802   |", u"|      \u2880 |"]
+
+    def testDensity(self):
+        x_coords = [10, 10, 10, 10, 20, 30]
+        y_coords = [10, 10, 10, 10, 20, 30]
+        result = """y: y
++--------------+
+|           =  |
+|              |
+|              |
+|       =      |
+|              |
+| @            |
++--------------+
+            x: x"""
+        assert _plot_scatter(x_coords, y_coords, 5, 'x', '', 'x', 'y', 'center', False, 'python', 'chars') == result
+        assert _plot_scatter(x_coords, y_coords, 5, 'x', '', 'x', 'y', 'center', False, 'auto', 'chars') == result
+
+    def testColours(self):
+        graph = _plot_scatter([1, 2, 2], [1, 2, 2], 1, 'x', '', 'x', 'y', 'center', False, 'python',
+                              colours=['red', 'blue', 'green'])
+        assert get_colour('blue') + 'x' + bcolours['ENDC'] in graph
+        assert get_colour('red') + 'x' in graph and get_colour('green') not in graph
+
+
+class statsTestCase(unittest.TestCase):
+    def testRunningStats(self):
+        values = [2.0, 4.0, 4.0, 4.0, 5.0, 5.0, 7.0, 9.0]
+        stats = RunningStats()
+        for v in values:
+            stats.update(v)
+        mean = sum(values) / len(values)
+        sd = (sum((v - mean) ** 2 for v in values) / (len(values) - 1)) ** 0.5
+        assert stats.n == 8 and stats.min == 2.0 and stats.max == 9.0
+        assert abs(stats.mean - mean) < 1e-12 and abs(stats.sd - sd) < 1e-12
+
+    def testStreamingHistogramExact(self):
+        data = StreamingHistogram()
+        data.update([1.0, 2.0, 2.0, 3.0, 4.0, 5.0])
+        assert data.bin_counts([1, 2, 3, 4]) == [1, 2, 1, 2], "max value goes to the last bin"
+
+    def testBinLookup(self):
+        bins = [0, 0.5, 1, 1.5, 2]
+        lookup = BinLookup(bins, max_val=2.25)
+        for x in [-1, 0, 0.1, 0.5, 0.75, 1, 1.9999, 2]:
+            assert lookup.index(x) == min(i for i, b in enumerate(bins) if x <= b)
+        assert lookup.index(2.25) == 4, "max value goes to the last bin"
+        assert lookup.index(2.1) is None
+        assert BinLookup([0, 1, 5, 6], 6).index(4) == 2, "irregular edges"
+
+    def testMerge(self):
+        values = [((i * 7919) % 10007) / 7.0 for i in range(5000)]
+        whole = StreamingHistogram(max_bins=128)
+        whole.update(values)
+        left, right = StreamingHistogram(max_bins=128), StreamingHistogram(max_bins=128)
+        left.update(values[:4900])
+        right.update(values[4900:])
+        left.merge(right)
+        assert left.width == whole.width and left.counts == whole.counts
+        assert left.stats.n == 5000 and abs(left.stats.mean - whole.stats.mean) < 1e-9
+        assert abs(left.stats.sd - whole.stats.sd) < 1e-9
+
+    def testStreamingHistogramCollapse(self):
+        data = StreamingHistogram(max_bins=64)
+        data.update(float(i) for i in range(10000))
+        assert len(data.counts) <= 64
+        assert sum(data.bin_counts([0, 2500, 5000, 7500, 9999])) == 10000
+        assert data.stats.min == 0.0 and data.stats.max == 9999.0
+        # pooled cells straddle the edges, so the values are counted again
+        values = [(i * 7919 % 20011) / 3.0 for i in range(20000)]
+        bins = [0, 1234.5, 2469, 3703.5, 4938, 6172.5]
+        assert exact_bin_counts([values[:700], values[700:]], bins, max(values)) == naive_bin_counts(values, bins)
+        result = compute_hist(values, 17, backend="python")
+        assert result.counts == naive_bin_counts(values, result.edges)
+
+    def testReservoir(self):
+        counts = [0] * 40
+        for seed in range(2000):
+            sample = Reservoir(5, seed)
+            for start in range(0, 40, 7):
+                xs = list(range(start, min(start + 7, 40)))
+                sample.update(xs, [-x for x in xs])
+            assert len(sample.xs) == 5 and sample.seen == 40
+            for x in sample.xs:
+                counts[int(x)] += 1
+        # every point is kept with probability 5/40
+        assert all(200 < count < 300 for count in counts)
+        assert sample.x_bounds == (0, 39) and sample.y_bounds == (-39, 0)
+
+    def testWeighted(self):
+        expanded = StreamingHistogram()
+        expanded.update([1.0, 1.0, 1.0, 5.0, 5.0, 10.0])
+        weighted = StreamingHistogram()
+        weighted.update([1.0, 2.0, 5.0, 10.0], [3, 0, 2, 1])
+        assert weighted.counts == {1.0: 3, 5.0: 2, 10.0: 1}
+        assert weighted.stats.n == 6 and weighted.stats.min == 1.0
+        assert abs(weighted.stats.mean - expanded.stats.mean) < 1e-12
+        assert abs(weighted.stats.sd - expanded.stats.sd) < 1e-12
+        lines = compute_hist(io.BytesIO(b"1,3\n2,0\n5 2\n10,1\n"), 5, weights=True, percentiles=[50])
+        listed = compute_hist([1, 2, 5, 10], 5, weights=[3, 0, 2, 1], percentiles=[50])
+        assert lines.counts == listed.counts == [3, 0, 0, 2, 0, 1] and lines.quantiles == listed.quantiles
+        self.assertRaises(ValueError, compute_hist, [1, 2], weights=[1])
+        # numbers are never paired across lines
+        for text in (b"10\n2,3\n4\n", b"1,2,3\n4,5,6\n", b"1,2\n\n3\n"):
+            self.assertRaises(ValueError, compute_hist, io.BytesIO(text), weights=True)
+        self.assertRaises(ValueError, compute_hist, ["1,2", "3,4,5", "6"], weights=True)
+        blank = compute_hist(io.StringIO("1,3\n\n 2 0\r\n5, 2\n10\t1"), 5, weights=True)
+        assert blank.counts == lines.counts
+
+    def testHistogramState(self):
+        values = [float(i % 97) for i in range(3000)]
+        whole = HistogramState([0, 24, 48, 72, 96], sketch=QuantileSketch())
+        whole.update(values)
+        left = HistogramState([0, 24, 48, 72, 96], sketch=QuantileSketch())
+        left.update(values[:1000])
+        right = HistogramState.from_json(HistogramState([0, 24, 48, 72, 96], sketch=QuantileSketch()).to_json())
+        right.update(values[1000:])
+        left.merge(pickle.loads(pickle.dumps(HistogramState.from_json(right.to_json()))))
+        assert left.counts == whole.counts and sum(left.counts) == 3000
+        assert left.stats.n == 3000 and abs(left.stats.sd - whole.stats.sd) < 1e-9
+        assert left.sketch.quantile(0.5) == whole.sketch.quantile(0.5)
+        assert left.render(percentiles=[50]) == whole.render(percentiles=[50])
+        with self.assertRaises(ValueError):
+            left.merge(HistogramState([0, 50, 100]))
+
+    def testHistogramResult(self):
+        values = [float(i % 13) for i in range(500)]
+        result = compute_hist(values, bincount=6, percentiles=[50])
+        assert result.edges == [0, 2, 4, 6, 8, 10, 12] and sum(result.counts) == 500
+        assert result.quantiles[50] is not None
+        for draw, plot, kwargs in ((draw_vertical, plot_hist, {}), (draw_horizontal, plot_hbar, {})):
+            out = io.StringIO()
+            with redirect_stdout(out):
+                plot(values, bincount=6, showSummary=True, percentiles=[50])
+            assert draw(result, showSummary=True).render() == out.getvalue()
+        state = HistogramState(result.edges)
+        state.update(values)
+        assert state.render("horizontal") == draw_horizontal(result).render()
+
+    def testHorizontalBars(self):
+        result = compute_hist([0.0] * 2 + [9.0] * 8, bincount=3)
+        rows = draw_horizontal(result, width=8, pch="x").render(colour=False).splitlines()
+        assert rows[0] == " 9| xxxxxxxx" and rows[-2] == " 0| xx      "
+        result = compute_hist([float(i) for i in range(5000)], bincount=5000)
+        rows = draw_horizontal(result, showSummary=True).render(colour=False).splitlines()
+        assert rows[len(result.edges)].lstrip().startswith("+-") and max(len(row) for row in rows) < 80
+
+
+class readersTestCase(unittest.TestCase):
+    def setUp(self):
+        self.values = [float(i) / 8 for i in range(-500, 1500)]
+        self.text = "\n".join(str(v) for v in self.values) + "\n\n"
+
+    def testFileBatches(self):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as fh:
+            fh.write(self.text)
+        try:
+            batches = list(read_number_batches(path, chunk_size=100))
+            assert len(batches) > 1
+            assert [v for b in batches for v in b] == self.values
+        finally:
+            os.remove(path)
+
+    def testStreamBatches(self):
+        batches = read_number_batches(io.StringIO(self.text), chunk_size=7)
+        assert [v for b in batches for v in b] == self.values
+        batches = read_number_batches(io.BytesIO(self.text.encode()), chunk_size=64)
+        assert [v for b in batches for v in b] == self.values
+
+    def testIterableBatches(self):
+        batches = read_number_batches([" 1\n", 2, "3.5"])
+        assert [list(b) for b in batches] == [[1.0, 2.0, 3.5]]
+
+    def testCache(self):
+        cache_dir = tempfile.mkdtemp()
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as fh:
+            fh.write(self.text)
+        try:
+            batches = cached_batches(path, cache_dir, chunk_size=100)
+            assert [v for b in batches for v in b] == self.values
+            sidecar = sidecar_path(path, cache_dir)
+            assert os.listdir(cache_dir) == [os.path.basename(sidecar)]
+            # a hit reads the sidecar, not the text
+            mtime = os.stat(path).st_mtime_ns
+            with open(path, "w") as fh:
+                fh.write(self.text.replace("-62.5", "-12.5", 1))
+            os.utime(path, ns=(mtime, mtime))
+            assert [v for b in cached_batches(path, cache_dir) for v in b] == self.values
+            os.utime(path, ns=(0, 0))
+            assert [v for b in cached_batches(path, cache_dir, max_bytes=1) for v in b][0] == -12.5
+            assert os.listdir(cache_dir) == [os.path.basename(sidecar_path(path, cache_dir))]
+        finally:
+            os.remove(path)
+            shutil.rmtree(cache_dir)
+
+    def testReadColumns(self):
+        text = 'name,"x, m",y,colour\n"a, b",1.5,2,red\n\nc,3,-4.25,blue\n'
+        xs, ys, cs = read_columns(io.StringIO(text), ["x, m", "y", 3], text=(2,))
+        assert list(xs) == [1.5, 3.0] and list(ys) == [2.0, -4.25] and cs == ["red", "blue"]
+        # a header selected by index is skipped
+        xs, ys = read_columns(text.splitlines(), ["2", 1])
+        assert list(xs) == [2.0, -4.25] and list(ys) == [1.5, 3.0]
+        xs, ys = read_columns(["1;2", "3;4"], [1, 0], delimiter=";")
+        assert list(xs) == [2.0, 4.0] and list(ys) == [1.0, 3.0]
+        with self.assertRaises(ValueError):
+            read_columns(io.StringIO(text), ["z", "y"])
+
+    def testIterColumns(self):
+        lines = ["x,y", "1,2", "", "3,4", "5,6"]
+        batches = list(iter_columns(lines, ["x", "y"], batch_size=2))
+        assert [list(xs) for xs, _ in batches] == [[1.0, 3.0], [5.0]]
+        assert list(iter_columns([], [0, 1], batch_size=2)) == []
+
+    def testBinaryBatches(self):
+        data = struct.pack("<%dd" % len(self.values), *self.values)
+        batches = read_binary_batches(io.BytesIO(data), "f8", chunk_size=100)
+        assert [v for b in batches for v in b] == self.values
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(struct.pack("<%df" % len(self.values), *self.values))
+        try:
+            # x,y pairs are never split between batches
+            batches = [list(b) for b in read_binary_batches(path, "f4", chunk_size=100, group=2)]
+            assert len(batches) > 1 and all(len(b) % 2 == 0 for b in batches)
+            assert [v for b in batches for v in b] == self.values
+            for backend in ("python", "numpy") if np is not None else ("python",):
+                binary = compute_hist(path, 10, backend=backend, binary="f4", percentiles=[50])
+                text = compute_hist(io.StringIO(self.text), 10, backend=backend, percentiles=[50])
+                assert binary.counts == text.counts and binary.summary_lines() == text.summary_lines()
+                assert binary.quantiles == text.quantiles
+        finally:
+            os.remove(path)
+        with self.assertRaises(ValueError):
+            list(read_binary_batches(io.BytesIO(data[:-3]), "f8"))
+
+    def testParallelRead(self):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as fh:
+            fh.write(self.text)
+        try:
+            ranges = split_file(path, 3)
+            assert ranges[0][0] == 0 and ranges[-1][1] == os.path.getsize(path)
+            data, sketch = parallel_read(path, 3, with_sketch=True)
+            serial = StreamingHistogram()
+            serial.update(self.values)
+            assert data.counts == serial.counts and data.stats.n == serial.stats.n
+            assert abs(data.stats.sd - serial.stats.sd) < 1e-9
+            assert sketch.n == len(self.values)
+            bins = [0, 50, 100]
+            assert parallel_bin_counts(path, 3, bins, max(self.values)) == naive_bin_counts(self.values, bins)
+            # too many distinct values to count them one by one: the bins
+            # still match a serial read exactly
+            values = [(i * 7919 % 20011) / 3.0 for i in range(20000)]
+            with open(path, "w") as fh:
+                fh.write("\n".join(repr(v) for v in values))
+            serial = compute_hist(path, 17, backend="python")
+            parallel = compute_hist(path, 17, backend="python", workers=3)
+            assert parallel.counts == serial.counts == naive_bin_counts(values, parallel.edges)
+            assert parallel.summary_lines() == serial.summary_lines()
+        finally:
+            os.remove(path)
+
+
+class sketchTestCase(unittest.TestCase):
+    def testRelativeError(self):
+        values = [((i * 7919) % 10007 - 3000) / 3.0 for i in range(10007)]
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        sketch.update(values)
+        values.sort()
+        for q in (0.01, 0.25, 0.5, 0.9, 0.99, 0.999):
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(sketch.quantile(q) - exact) <= 0.01 * abs(exact)
+        assert sketch.quantile(0) == values[0] and sketch.quantile(1) == values[-1]
+
+    def testMergeAndBound(self):
+        a, b = QuantileSketch(max_buckets=32), QuantileSketch(max_buckets=32)
+        a.update([2.0 ** i for i in range(0, 40)])
+        b.update([2.0 ** -i for i in range(1, 40)])
+        a.merge(b)
+        assert a.n == 79 and len(a.positive) <= 32
+        assert abs(a.quantile(0.9) - 2.0 ** 31) <= 0.01 * 2.0 ** 31
+
+    def testParsePercentiles(self):
+        assert parse_percentiles("50,99,99.9") == [50.0, 99.0, 99.9]
+        self.assertRaises(ValueError, parse_percentiles, "101")
+
+
+class followTestCase(unittest.TestCase):
+    def testWindow(self):
+        stream = io.StringIO("".join("%d\n" % v for v in [100] * 50 + [1, 2, 2, 3, 3, 3]))
+        out = io.StringIO()
+        follow_hist(stream, interval=0.01, window=6, showSummary=True, out=out)
+        frame = "\n".join(screen(out.getvalue()))
+        assert "observations: 6" in frame
+        assert "max value: 3.000000" in frame
+
+    def testReadError(self):
+        # a reader that fails ends the redraws with its error
+        def broken():
+            yield "1\n"
+            raise IOError("gone")
+        for follow in (follow_hist, follow_timeseries):
+            self.assertRaises(IOError, follow, broken(), interval=0.01, out=io.StringIO())
+
+    def testSeveralFiles(self):
+        argv = sys.argv
+        sys.argv = ["hist", "--follow", "a.txt", "b.txt"]
+        try:
+            with redirect_stderr(io.StringIO()) as err, self.assertRaises(SystemExit) as exit:
+                hist_main()
+        finally:
+            sys.argv = argv
+        assert exit.exception.code == 2 and "--follow takes a single input" in err.getvalue()
+
+    def testSeveralFilesCached(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            paths, values = [], []
+            for k in range(2):
+                part = [(i * 7919 + k) % 20000 / 7.0 for i in range(20000)]
+                paths.append(os.path.join(tmp, "%d.txt" % k))
+                with open(paths[-1], "w") as f:
+                    f.write("".join("%r\n" % x for x in part))
+                values += part
+            cache_dir = os.path.join(tmp, "cache")
+            backends = ["python", "numpy"] if np is not None else ["python"]
+            states = [read_histogram(paths, 10, backend=backend, cache_dir=cache_dir) for backend in backends]
+            # each file got its sidecar, and every backend counts exactly
+            assert len(os.listdir(cache_dir)) == 2
+            for state in states:
+                assert list(state.counts) == naive_bin_counts(values, state.bins)
+                assert state.stats.n == len(values)
+        finally:
+            shutil.rmtree(tmp)
+
+    def testDecay(self):
+        data = StreamingHistogram()
+        data.update([1.0, 1.0, 2.0])
+        data.decay(0.5)
+        assert data.counts == {1.0: 1.0, 2.0: 0.5}
+        assert data.stats.n == 1.5 and data.stats.mean == 4.0 / 3
+
+
+class serverTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "plot.sock")
+        self.server = PlotServer(self.path, _PlotHandler)
+        # serve() creates the socket with no group or other permissions
+        os.chmod(self.path, 0o600)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(os.path.dirname(self.path))
+
+    def testForward(self):
+        stdin = io.BytesIO("".join("%d\n" % i for i in range(100)).encode())
+        out, err = io.BytesIO(), io.BytesIO()
+        assert forward("hist", ["-b", "5"], stdin, out, err, self.path) == 0
+        assert out.getvalue().startswith(b"y_axis") and b"Summary" in out.getvalue() and not err.getvalue()
+        out, err = io.BytesIO(), io.BytesIO()
+        assert forward("hist", ["--bogus"], io.BytesIO(), out, err, self.path) == 2
+        assert b"no such option" in err.getvalue()
+        assert forward("hist", [], path=self.path + ".missing") is None
+
+    def testEnvironment(self):
+        events = b"0,1\n3600,2\n"
+        for tz, label in (("UTC", b"01-01 00:00"), ("Asia/Kolkata", b"01-01 05:30")):
+            out = io.BytesIO()
+            env = dict(os.environ, TZ=tz)
+            assert forward("timehist", ["-b", "1h"], io.BytesIO(events), out, io.BytesIO(), self.path, env) == 0
+            assert label in out.getvalue()
+        # only a stale socket is removed, never another kind of file
+        path = os.path.join(os.path.dirname(self.path), "plain")
+        with open(path, "w") as fh:
+            fh.write("keep")
+        self.assertRaises(RuntimeError, serve, path)
+        assert os.path.exists(path)
+
+    def testUntrustedSocket(self):
+        # a socket other users can reach, or that belongs to another user,
+        # never gets the arguments, input or environment
+        path = os.path.join(os.path.dirname(self.path), "spoof.sock")
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(path)
+        listener.listen(1)
+        listener.settimeout(0.2)
+        try:
+            os.chmod(path, 0o666)
+            assert forward("hist", [], io.BytesIO(b"1\n"), io.BytesIO(), io.BytesIO(), path) is None
+            if os.getuid() == 0:
+                os.chmod(path, 0o600)
+                os.chown(path, 12345, -1)
+                assert forward("hist", [], io.BytesIO(b"1\n"), io.BytesIO(), io.BytesIO(), path) is None
+            self.assertRaises(socket.timeout, listener.accept)
+        finally:
+            listener.close()
+
+
+class timeseriesTestCase(unittest.TestCase):
+    def testTimeBuckets(self):
+        data = TimeBuckets(10, 3)
+        for t, value in [(0, 1.0), (5, 3.0), (12, 2.0), (29, 4.0), (3, 2.0)]:
+            data.add(t, value)
+        assert data.series("count") == [(0.0, 3.0), (10.0, 1.0), (20.0, 1.0)]
+        assert data.series("mean") == [(0.0, 2.0), (10.0, 2.0), (20.0, 4.0)]
+        # the window moves past the oldest bucket, which is dropped
+        assert data.add(31, 1.0) and not data.add(9, 1.0)
+        data.advance(1000)
+        assert data.series("count") == [(980.0, 0.0), (990.0, 0.0), (1000.0, 0.0)]
+        assert data.series("mean")[0][1] is None
+
+    def testReadEvents(self):
+        lines = ["2023-11-14T22:13:20Z,2", "1700000001", "bad line", "1700000010.5,4"]
+        data = read_events(lines, TimeBuckets(parse_duration("10s"), 2))
+        assert data.series("sum") == [(1700000000.0, 3.0), (1700000010.0, 4.0)]
+        assert sparkline([0, 2, 7, None]) == u"\u2581\u2583\u2588 "
+
+
+class dashboardTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testLayout(self):
+        lines = layout([["a", "bbb"], ["\033[91mcc\033[0m"], ["d"]], 2)
+        assert lines == ["a    \033[91mcc\033[0m", "bbb", "", "d"]
+
+    def testPanes(self):
+        pipe = os.path.join(self.dir, "pipe")
+        points = os.path.join(self.dir, "points.csv")
+        os.mkfifo(pipe)
+        with open(points, "w") as fh:
+            fh.write("".join("%d,%d\n" % (i, i * i) for i in range(20)))
+
+        def write():
+            with open(pipe, "w") as fh:
+                fh.write("".join("%d\n" % i for i in range(100)))
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        hist, scatter = HistPane("pipe", bincount=5), ScatterPane("points.csv")
+        out = io.StringIO()
+        asyncio.run(run_dashboard([(pipe, hist), (points, scatter)], fps=100, out=out))
+        writer.join()
+        assert hist.data.stats.n == 100 and len(scatter.xs) == 20
+        last = "\n".join(screen(out.getvalue()))
+        assert "pipe" in last and "points.csv" in last and "waiting" not in last
+        # a long stream keeps a bounded sample, on axes covering every point
+        sampled = ScatterPane("s", sample=8)
+        for i in range(1000):
+            sampled.add("%d,%d" % (i, i % 7))
+        assert len(sampled.xs) == 8 and sampled.sample.seen == 1000
+        assert sampled.sample.x_bounds == (0, 999) and sampled.sample.y_bounds == (0, 6)
+        assert "waiting for data" not in sampled.render()
+
+
+class profileTestCase(unittest.TestCase):
+    def testPhases(self):
+        profiles = []
+        with redirect_stdout(io.StringIO()):
+            plot_hist(io.BytesIO(b"1\n2\n3\n4\n"), bincount=2, backend="python", on_profile=profiles.append)
+            plot_scatter(["1,2", "3,4", "5,6"], None, None, 5, "x", "default", "", on_profile=profiles.append)
+        hist, scatter = profiles
+        assert hist.values == 4 and hist.bytes == 8 and sorted(hist.seconds) == sorted(PHASES)
+        assert all(hist.seconds[phase] > 0 for phase in ("read", "parse", "stats", "bin", "render", "write"))
+        assert scatter.values == 3 and scatter.bytes == 9 and scatter.to_dict()["total"] == scatter.total
+        assert "3 values" in scatter.report()
+
+
+class redrawTestCase(unittest.TestCase):
+    def testDiff(self):
+        frames = [
+            "a\n\033[91mbbbb\033[0m cccc dddd\n",
+            "a\n\033[91mbbbx\033[0m cccc dddd\n",
+            "a\nbb\nmore\nlines\n",
+            "\033[94mz\033[0m\n",
+            "\033[94mz\033[0m\n",
+        ]
+        redraw = Redrawer()
+        output = ""
+        for frame in frames:
+            diff = redraw.diff(frame)
+            output += diff
+            assert screen(output)[:-1] == re.sub("\033\\[[0-9;]*m", "", frame).split("\n")[:-1]
+        assert diff == ""
+        # one changed character is sent with its colour and a cursor move
+        redraw = Redrawer()
+        redraw.diff(frames[0])
+        assert redraw.diff(frames[1]) == "\033[1A\r\033[3C\033[91mx\033[39m\033[1B\r"
+
+
+class canvasTestCase(unittest.TestCase):
+    def testCoalesceRuns(self):
+        canvas = Canvas()
+        canvas.draw("1| ")
+        for ch in "oo o":
+            canvas.draw(ch, "blue")
+        canvas.newline()
+        canvas.draw("--\n")
+        assert canvas.render() == "1| \033[94moo o\033[39m\n--\n"
+        assert canvas.render(colour=False) == "1| oo o\n--\n"
+
+
+class backendTestCase(unittest.TestCase):
+    def testResolveBackend(self):
+        assert resolve_backend("python") == "python"
+        assert resolve_backend("auto") == ("python" if np is None else "numpy")
+        self.assertRaises(ValueError, resolve_backend, "fortran")
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def testHistBackendsMatch(self):
+        values = [str((i * 37) % 101 / 7.0) for i in range(500)]
+        # more distinct values than a StreamingHistogram counts one by one
+        many = [repr((i * 7919 % 20011) / 3.0 - 1000) for i in range(20000)]
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as fh:
+            fh.write("\n".join(many) + "\n")
+        try:
+            for f, bincount in ((values, 13), (many, 40), (path, 40)):
+                outputs = []
+                for backend in ("python", "numpy"):
+                    buf = io.StringIO()
+                    with redirect_stdout(buf):
+                        plot_hist(f, bincount=bincount, showSummary=True, xlab=True, backend=backend)
+                    outputs.append(buf.getvalue())
+                assert outputs[0] == outputs[1]
+        finally:
+            os.remove(path)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def testScatterBackendsMatch(self):
+        xs = [20, 20, 30, 15, -16, 18, 0, 0]
+        ys = [20, 20, 30, 21, -35, 12, 0, -5]
+        for show_axes in (True, False):
+            assert _plot_scatter(xs, ys, 10, 'x', 'T', 'x', 'y', 'center', show_axes, 'python') == \
+                   _plot_scatter(xs, ys, 10, 'x', 'T', 'x', 'y', 'center', show_axes, 'numpy')
+            assert _plot_scatter(xs, ys, 10, 'x', 'T', 'x', 'y', 'center', show_axes, 'python', braille=True) == \
+                   _plot_scatter(xs, ys, 10, 'x', 'T', 'x', 'y', 'center', show_axes, 'numpy', braille=True)
+
+
 if __name__ == "__main__":
     unittest.main()